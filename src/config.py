@@ -6,11 +6,18 @@ import os
 
 # Notion API
 NOTION_API_BASE = "https://api.notion.com/v1"
+NOTION_RATE_LIMIT = 3  # Requests per second per integration
+NOTION_MAX_RETRIES = 5  # Retries for 429 / 5xx / network errors
+NOTION_BLOCK_MAX_DEPTH = 8  # Nesting levels followed when fetching page bodies
 DEFAULT_MODE = "共感・エッセイ型"
 
 # Image generation
 IMAGE_WIDTH = 1280
 IMAGE_HEIGHT = 670
+HEADER_IMAGE_FORMAT = "png"  # png / png8 (256-colour palette) / jpeg / webp
+HEADER_IMAGE_QUALITY = 90  # JPEG / WebP quality (1-100)
+HEADER_IMAGE_COMPRESS_LEVEL = 6  # PNG zlib level (0-9)
+HEADER_IMAGE_MAX_BYTES = 0  # Upper bound for the encoded image (0 = unlimited)
 
 # Mode definitions
 MODES = {
@@ -28,3 +35,41 @@ REQUIRED_ENV_VARS = [
 
 # OpenAI
 OPENAI_DEFAULT_MODEL = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+OPENAI_TOKENS_PER_MINUTE = 0  # Formatting token budget per minute (0 = unlimited)
+OPENAI_BATCH_POLL_INTERVAL = 60  # Seconds between Batch API status polls
+OPENAI_BATCH_TIMEOUT = 5 * 60 * 60  # Seconds before an unfinished batch is cancelled
+OPENAI_BATCH_CANCEL_TIMEOUT = 10 * 60  # Seconds to wait for a cancelled batch to settle
+
+# Local caches (kept between runs; restored by actions/cache on GitHub Actions)
+CACHE_DIR = ".cache"
+FORMAT_CACHE_PATH = os.path.join(CACHE_DIR, "format_cache.sqlite3")
+FORMAT_CACHE_MAX_ENTRIES = 500
+FORMAT_CACHE_MAX_AGE_DAYS = 30
+HEADER_CACHE_DIR = os.path.join(CACHE_DIR, "headers")
+HEADER_CACHE_MAX_ENTRIES = 200
+HEADER_CACHE_MAX_BYTES = 100 * 1024 * 1024
+PAGE_STATE_PATH = os.path.join(CACHE_DIR, "page_state.sqlite3")
+PAGE_MAX_ATTEMPTS = 3  # Attempts per unchanged version of a failing page
+
+# Pipeline concurrency (overridable via environment variables)
+PIPELINE_FORMAT_WORKERS = 4
+PIPELINE_RENDER_WORKERS = 2
+PIPELINE_DONE_WORKERS = 4
+PIPELINE_QUEUE_SIZE = 4
+
+
+def env_flag(name: str) -> bool:
+    """Read a boolean setting ("1", "true", "yes", "on") from the environment."""
+    return os.environ.get(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_int(name: str, default: int, minimum: int = 1) -> int:
+    """Read an integer setting from the environment (clamped to minimum)."""
+    value = os.environ.get(name, "").strip()
+    if not value:
+        return default
+    try:
+        return max(minimum, int(value))
+    except ValueError:
+        print(f"Warning: Invalid value for {name}: {value!r}, using {default}")
+        return default
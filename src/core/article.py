@@ -0,0 +1,22 @@
+"""
+Article record passed from the Notion client through the pipeline.
+"""
+
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class Article:
+    """
+    A Ready page, reduced to the fields the pipeline uses.
+
+    Slotted: no per-instance __dict__, which adds up when thousands of
+    pages (with their full content strings) are held at once.
+    """
+
+    id: str
+    title: str
+    mode: str
+    content: str
+    # ISO 8601 timestamp of the page's last edit ("" if unknown)
+    last_edited_time: str = ""
@@ -0,0 +1,183 @@
+"""
+OpenAI Batch API mode for formatting large backlogs.
+
+All Ready articles are submitted as one batch job (half the token price and
+no per-request rate limits), polled until the job finishes, and parsed into
+(title, body) pairs for the posting stage. Set OPENAI_BASE_URL to point the
+client at a local fake endpoint for testing.
+"""
+
+import asyncio
+import json
+import time
+from typing import Iterable
+
+from openai import AsyncOpenAI
+
+from core.format_cache import FormatCache, get_format_cache
+from core.openai_formatter import (
+    MAX_OUTPUT_TOKENS,
+    _build_messages,
+    _get_api_key,
+    _get_model,
+    _parse_formatted,
+)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_FINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+# Upper bound between status polls while a cancelled batch winds down
+BATCH_CANCEL_POLL_INTERVAL = 10.0
+
+
+def build_batch_jsonl(items: Iterable[tuple[str, str, str]], model: str) -> bytes:
+    """
+    Build the batch input file.
+
+    Args:
+        items: (custom_id, content, mode) tuples
+        model: OpenAI model name
+
+    Returns:
+        JSONL bytes, one chat completion request per line
+    """
+    lines = []
+    for custom_id, content, mode in items:
+        lines.append(json.dumps({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": BATCH_ENDPOINT,
+            "body": {
+                "model": model,
+                "max_tokens": MAX_OUTPUT_TOKENS,
+                "messages": _build_messages(content, mode),
+            },
+        }, ensure_ascii=False))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def parse_batch_output(output_jsonl: str) -> dict[str, tuple[str, str] | Exception]:
+    """Parse batch output (or error) file lines into per-article results."""
+    results: dict[str, tuple[str, str] | Exception] = {}
+    for line in output_jsonl.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        custom_id = record["custom_id"]
+        response = record.get("response") or {}
+        if record.get("error") or response.get("status_code") != 200:
+            error = record.get("error") or response.get("body", {}).get("error")
+            results[custom_id] = RuntimeError(f"Batch request failed: {error}")
+            continue
+        content = response["body"]["choices"][0]["message"]["content"]
+        results[custom_id] = _parse_formatted(content)
+    return results
+
+
+async def format_articles_batch(
+    items: list[tuple[str, str, str]],
+    poll_interval: float = 60.0,
+    timeout: float = 5 * 60 * 60,
+    cancel_timeout: float = 10 * 60,
+) -> dict[str, tuple[str, str] | Exception]:
+    """
+    Format articles through one Batch API job.
+
+    Args:
+        items: (custom_id, content, mode) tuples, custom_id unique per article
+        poll_interval: Seconds between status polls
+        timeout: Seconds to wait before cancelling the job
+        cancel_timeout: Seconds to wait for a cancelled job to settle, so the
+            requests it already finished can still be read
+
+    Returns:
+        Mapping of custom_id to (title, body) or the exception for that item.
+        Items that are missing (job cancelled, expired or failed) or failed
+        should be formatted another way.
+    """
+    model = _get_model()
+
+    # Articles formatted by an earlier run are served from the cache
+    cache = get_format_cache()
+    cached: dict[str, tuple[str, str]] = {}
+    cache_keys: dict[str, str] = {}
+    pending = []
+    for custom_id, content, mode in items:
+        key = FormatCache.make_key(content, mode, model, _build_messages(content, mode))
+        hit = cache.get(key) if cache else None
+        if hit:
+            cached[custom_id] = hit
+        else:
+            cache_keys[custom_id] = key
+            pending.append((custom_id, content, mode))
+
+    if cached:
+        print(f"✓ {len(cached)} article(s) served from the format cache")
+    if not pending:
+        return cached
+    items = pending
+
+    client = AsyncOpenAI(api_key=_get_api_key())
+    try:
+        input_file = await client.files.create(
+            file=("note_articles_batch.jsonl", build_batch_jsonl(items, model)),
+            purpose="batch",
+        )
+        batch = await client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=BATCH_COMPLETION_WINDOW,
+        )
+        print(f"Submitted batch {batch.id} with {len(items)} article(s) (model: {model})")
+
+        batch = await _poll_batch(client, batch, poll_interval, time.monotonic() + timeout)
+        if batch.status not in BATCH_FINAL_STATES:
+            print(f"Batch {batch.id} not finished after {timeout:.0f}s, cancelling")
+            batch = await client.batches.cancel(batch.id)
+            # The output file only appears once 'cancelling' has become 'cancelled'
+            batch = await _poll_batch(
+                client,
+                batch,
+                min(poll_interval, BATCH_CANCEL_POLL_INTERVAL),
+                time.monotonic() + cancel_timeout,
+            )
+            if batch.status not in BATCH_FINAL_STATES:
+                print(
+                    f"⚠ Batch {batch.id} still '{batch.status}' after {cancel_timeout:.0f}s, "
+                    "its finished requests cannot be read"
+                )
+
+        results: dict[str, tuple[str, str] | Exception] = dict(cached)
+        # Cancelled/expired batches still report partial results
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                content = await client.files.content(file_id)
+                results.update(parse_batch_output(content.text))
+
+        if cache:
+            for custom_id, key in cache_keys.items():
+                result = results.get(custom_id)
+                if isinstance(result, tuple):
+                    cache.put(key, *result)
+
+        print(
+            f"Batch {batch.id} finished with status '{batch.status}': "
+            f"{len(results) - len(cached)} result(s)"
+        )
+        return results
+    finally:
+        await client.close()
+
+
+async def _poll_batch(client: AsyncOpenAI, batch, poll_interval: float, deadline: float):
+    """Poll the batch until it reaches a final state or the deadline passes."""
+    while batch.status not in BATCH_FINAL_STATES and time.monotonic() < deadline:
+        await asyncio.sleep(poll_interval)
+        batch = await client.batches.retrieve(batch.id)
+        counts = batch.request_counts
+        if counts:
+            print(
+                f"Batch {batch.id}: {batch.status} "
+                f"({counts.completed}/{counts.total} done, {counts.failed} failed)"
+            )
+    return batch
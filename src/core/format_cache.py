@@ -0,0 +1,141 @@
+"""
+On-disk cache of formatted articles.
+
+Entries are keyed by a hash of the content, mode, model and the exact prompt
+messages, so a re-run after a failed post reuses the earlier OpenAI output,
+while any prompt or model change produces a fresh key. Stored in SQLite and
+evicted by age and entry count.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+# Add parent directory to path for config import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import (
+    FORMAT_CACHE_PATH,
+    FORMAT_CACHE_MAX_ENTRIES,
+    FORMAT_CACHE_MAX_AGE_DAYS,
+    env_int,
+)
+from core.shared_instance import SharedInstance
+
+
+class FormatCache:
+    """SQLite-backed (title, body) cache, shared between threads."""
+
+    def __init__(self, path: str, max_entries: int = 500, max_age_days: int = 30):
+        """
+        Args:
+            path: SQLite database file (parent directories are created)
+            max_entries: Entries kept after eviction (least recently used go first)
+            max_age_days: Entries older than this are dropped
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_days * 24 * 60 * 60
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS formatted (
+                key TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                body TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+        self.evict()
+
+    @staticmethod
+    def make_key(content: str, mode: str, model: str, messages: list[dict]) -> str:
+        """Hash everything that determines the model output."""
+        payload = json.dumps(
+            {"content": content, "mode": mode, "model": model, "messages": messages},
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> tuple[str, str] | None:
+        """Return the cached (title, body), or None on a miss (or a database error)."""
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT title, body, created_at FROM formatted WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                if now - row[2] > self.max_age_seconds:
+                    self._conn.execute("DELETE FROM formatted WHERE key = ?", (key,))
+                    self._conn.commit()
+                    return None
+                self._conn.execute("UPDATE formatted SET used_at = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"Warning: Could not read format cache: {e}")
+            return None
+        return row[0], row[1]
+
+    def put(self, key: str, title: str, body: str) -> None:
+        """Store a formatted article (a database error only logs a warning)."""
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO formatted (key, title, body, created_at, used_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, title, body, now, now),
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"Warning: Could not write format cache: {e}")
+
+    def evict(self) -> None:
+        """Drop expired entries and trim to max_entries."""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM formatted WHERE created_at < ?",
+                (time.time() - self.max_age_seconds,),
+            )
+            self._conn.execute(
+                "DELETE FROM formatted WHERE key NOT IN "
+                "(SELECT key FROM formatted ORDER BY used_at DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache = SharedInstance(
+    "Format cache",
+    disable_env="FORMAT_CACHE_DISABLE",
+    path_env="FORMAT_CACHE_PATH",
+    default_path=FORMAT_CACHE_PATH,
+    factory=lambda path: FormatCache(
+        path,
+        max_entries=env_int("FORMAT_CACHE_MAX_ENTRIES", FORMAT_CACHE_MAX_ENTRIES),
+        max_age_days=env_int("FORMAT_CACHE_MAX_AGE_DAYS", FORMAT_CACHE_MAX_AGE_DAYS),
+    ),
+    errors=(sqlite3.Error, OSError),
+)
+
+
+def get_format_cache() -> FormatCache | None:
+    """Return the process-wide cache (None if disabled or unavailable)."""
+    return _default_cache.get()
@@ -0,0 +1,107 @@
+"""
+On-disk cache of rendered header images.
+
+Entries are content-addressed: the key hashes everything that determines
+the pixels and the encoding (title, background, font, layout constants,
+output format), so a replay after a failed post reuses the earlier image
+and any change to the template produces a fresh key. One file per entry,
+evicted least-recently-used first by entry count and total size. Safe to
+share between the render worker processes.
+"""
+
+import os
+import sys
+import threading
+
+# Add parent directory to path for config import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import (
+    HEADER_CACHE_DIR,
+    HEADER_CACHE_MAX_ENTRIES,
+    HEADER_CACHE_MAX_BYTES,
+    env_int,
+)
+from core.shared_instance import SharedInstance
+
+HEADER_CACHE_SUFFIX = ".img"
+
+
+class HeaderCache:
+    """Directory of encoded header images named by their cache key."""
+
+    def __init__(self, directory: str, max_entries: int = 200, max_bytes: int = 100 * 1024 * 1024):
+        """
+        Args:
+            directory: Cache directory (created if missing)
+            max_entries: Entries kept after eviction (least recently used go first)
+            max_bytes: Total size kept after eviction
+        """
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + HEADER_CACHE_SUFFIX)
+
+    def get(self, key: str) -> bytes | None:
+        """Return the cached image bytes, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # The access time is not reliable (noatime mounts): bump mtime for LRU
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store an encoded image (atomically), then enforce the limits."""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self) -> None:
+        """Drop least recently used entries beyond max_entries / max_bytes."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(HEADER_CACHE_SUFFIX):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue  # Evicted by another worker meanwhile
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        entries.sort(reverse=True)
+        total = 0
+        for count, (_, size, path) in enumerate(entries, 1):
+            total += size
+            if count > self.max_entries or total > self.max_bytes:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+_default_cache = SharedInstance(
+    "Header cache",
+    disable_env="HEADER_CACHE_DISABLE",
+    path_env="HEADER_CACHE_DIR",
+    default_path=HEADER_CACHE_DIR,
+    factory=lambda directory: HeaderCache(
+        directory,
+        max_entries=env_int("HEADER_CACHE_MAX_ENTRIES", HEADER_CACHE_MAX_ENTRIES),
+        max_bytes=env_int("HEADER_CACHE_MAX_BYTES", HEADER_CACHE_MAX_BYTES),
+    ),
+    errors=OSError,
+)
+
+
+def get_header_cache() -> HeaderCache | None:
+    """Return the process-wide cache (None if disabled or unavailable)."""
+    return _default_cache.get()
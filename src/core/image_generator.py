@@ -3,13 +3,38 @@ Pillow-based image generator for note.com header images.
 Generates header images with article title overlay.
 """
 
+import functools
+import hashlib
+import io
+import json
+import math
+import multiprocessing
 import os
 import sys
+import weakref
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, NamedTuple
 from PIL import Image, ImageDraw, ImageFont
 
+try:
+    from fontTools.ttLib import TTFont
+except ImportError:  # Optional: glyph coverage is probed through Pillow instead
+    TTFont = None
+
 # Add parent directory to path for config import
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config import IMAGE_WIDTH, IMAGE_HEIGHT
+from config import (
+    IMAGE_WIDTH,
+    IMAGE_HEIGHT,
+    CACHE_DIR,
+    HEADER_IMAGE_FORMAT,
+    HEADER_IMAGE_QUALITY,
+    HEADER_IMAGE_COMPRESS_LEVEL,
+    HEADER_IMAGE_MAX_BYTES,
+    env_int,
+)
+from core.header_cache import get_header_cache
 
 # Assets directory
 ASSETS_DIR = os.path.join(
@@ -20,16 +45,123 @@ ASSETS_DIR = os.path.join(
 # Background image path
 BACKGROUND_IMAGE_PATH = os.path.join(ASSETS_DIR, "header_background.png")
 
+# Pre-resized background cache (invalidated when the source file changes)
+BACKGROUND_CACHE_DIR = os.path.join(CACHE_DIR, "backgrounds")
+
 # Fallback gradient colors (purple to blue)
 GRADIENT_START = (102, 126, 234)  # #667eea
 GRADIENT_END = (118, 75, 162)     # #764ba2
+GRADIENT_STOPS = ((0.0, GRADIENT_START), (1.0, GRADIENT_END))
+GRADIENT_ANGLE = 0  # Degrees counter-clockwise from top-to-bottom
+
+# Font fallback chain. RocknRoll One is primary (supports Japanese and English)
+FONT_PATHS = [
+    # Primary: RocknRoll One (supports Japanese and English)
+    os.path.join(ASSETS_DIR, "RocknRollOne.ttf"),
+    # Secondary: Other custom fonts
+    os.path.join(ASSETS_DIR, "DelaGothicOne.ttf"),
+    os.path.join(ASSETS_DIR, "Pacifico.ttf"),
+    # Tertiary: macOS system fonts
+    "/System/Library/Fonts/ヒラギノ角ゴシック W6.ttc",
+    "/System/Library/Fonts/ヒラギノ角ゴシック W3.ttc",
+    # Tertiary: Other macOS fonts
+    "/Library/Fonts/Arial Unicode.ttf",
+    "/System/Library/Fonts/Hiragino Sans GB.ttc",
+    # Linux (GitHub Actions) - CJK fonts
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Bold.ttc",
+    "/usr/share/fonts/truetype/noto/NotoSansCJK-Bold.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJKjp-Bold.otf",
+    "/usr/share/fonts/truetype/fonts-japanese-gothic.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    # Windows
+    "C:/Windows/Fonts/msgothic.ttc",
+    "C:/Windows/Fonts/meiryo.ttc",
+    "C:/Windows/Fonts/YuGothB.ttc",
+]
+
+# Parsed fonts are kept per size (least recently used evicted first)
+FONT_CACHE_SIZE = 16
+# Font size used to probe glyph coverage when fontTools is not installed
+GLYPH_PROBE_SIZE = 32
+# A codepoint no font maps; renders as the font's .notdef glyph
+NOTDEF_PROBE_CHAR = "\U0010FFFF"
+
+# Title layout: the largest size whose optimal breaking fits is used
+TITLE_FONT_SIZES = (120, 100, 85, 70, 60, 50)
+TITLE_MAX_LINES = 2
+TITLE_MAX_WIDTH = int(IMAGE_WIDTH * 0.8)  # 80% of image width
+TITLE_MAX_HEIGHT = int(IMAGE_HEIGHT * 0.8)
+# Line breaking badness weights (see _break_lines_optimal)
+BALANCE_WEIGHT = 100
+PROHIBITED_BREAK_PENALTY = 1000
+# Highest _break_score (hiragana -> kanji transition): such breaks cost 0
+BEST_BREAK_SCORE = 40
+# Longer titles use the greedy _wrap_text (the optimal breaker is quadratic)
+OPTIMAL_BREAK_MAX_CHARS = 200
+
+FONT_PRELOAD_SIZES = TITLE_FONT_SIZES
 
 # Text settings
 TEXT_COLOR = (0, 0, 0)  # Black
 TEXT_SHADOW_COLOR = (255, 255, 255)  # White shadow for readability
 
-
-def create_header_image(title: str, output_path: str) -> str:
+# Output encoders: name -> (MIME type, file extension)
+HEADER_IMAGE_FORMATS = {
+    "png": ("image/png", ".png"),
+    "png8": ("image/png", ".png"),  # Quantised to a 256-colour palette
+    "jpeg": ("image/jpeg", ".jpg"),
+    "webp": ("image/webp", ".webp"),
+}
+# Tried in order while the encoded image exceeds max_bytes
+QUALITY_STEPS = (90, 80, 70, 60, 50, 40)
+PALETTE_STEPS = (256, 128, 64, 32)
+# JPEG keeps full chroma resolution at this quality and above (sharper text)
+JPEG_FULL_CHROMA_QUALITY = 85
+
+# Part of the header cache key: bump when the drawing code changes the output
+RENDER_VERSION = 2
+
+
+class HeaderEncoding(NamedTuple):
+    """How header images are encoded (see HEADER_IMAGE_* in config)."""
+
+    format: str = HEADER_IMAGE_FORMAT
+    quality: int = HEADER_IMAGE_QUALITY
+    compress_level: int = HEADER_IMAGE_COMPRESS_LEVEL
+    max_bytes: int = HEADER_IMAGE_MAX_BYTES
+
+    @property
+    def mime_type(self) -> str:
+        return HEADER_IMAGE_FORMATS[self.format][0]
+
+    @property
+    def extension(self) -> str:
+        return HEADER_IMAGE_FORMATS[self.format][1]
+
+
+def get_header_encoding() -> HeaderEncoding:
+    """Read the header image encoding from HEADER_IMAGE_* environment variables."""
+    image_format = os.environ.get("HEADER_IMAGE_FORMAT", HEADER_IMAGE_FORMAT).strip().lower()
+    if image_format == "jpg":
+        image_format = "jpeg"
+    if image_format not in HEADER_IMAGE_FORMATS:
+        print(f"⚠ Unknown HEADER_IMAGE_FORMAT '{image_format}', using {HEADER_IMAGE_FORMAT}")
+        image_format = HEADER_IMAGE_FORMAT
+    return HeaderEncoding(
+        format=image_format,
+        quality=min(100, env_int("HEADER_IMAGE_QUALITY", HEADER_IMAGE_QUALITY)),
+        compress_level=min(
+            9, env_int("HEADER_IMAGE_COMPRESS_LEVEL", HEADER_IMAGE_COMPRESS_LEVEL, minimum=0)
+        ),
+        max_bytes=env_int("HEADER_IMAGE_MAX_BYTES", HEADER_IMAGE_MAX_BYTES, minimum=0),
+    )
+
+
+def create_header_image(
+    title: str,
+    output_path: str,
+    encoding: HeaderEncoding | None = None,
+) -> str:
     """
     Create a header image with background and title text overlay.
 
@@ -39,79 +171,394 @@ def create_header_image(title: str, output_path: str) -> str:
     Args:
         title: Article title to display on the image
         output_path: Path to save the generated image
+        encoding: Output encoding (default: from the environment, with the
+            format switched to match output_path's extension if it names
+            another format). An explicit encoding is used as is.
 
     Returns:
         Path to the generated image
     """
+    data = render_header_bytes(title, encoding or _encoding_for_path(output_path))
+    with open(output_path, "wb") as f:
+        f.write(data)
+    return output_path
+
+
+def _encoding_for_path(output_path: str) -> HeaderEncoding:
+    """The environment encoding, in the format output_path's extension names."""
+    encoding = get_header_encoding()
+    extension = os.path.splitext(output_path)[1].lower()
+    if extension in (".jpg", ".jpeg"):
+        extension = ".jpg"
+    if extension == encoding.extension:
+        return encoding  # Keeps png8 for .png paths
+    for image_format, (_, format_extension) in HEADER_IMAGE_FORMATS.items():
+        if format_extension == extension:
+            return encoding._replace(format=image_format)
+    return encoding
+
+
+def render_header_bytes(title: str, encoding: HeaderEncoding | None = None) -> bytes:
+    """
+    Create a header image in memory, without touching the disk.
+
+    Args:
+        title: Article title to display on the image
+        encoding: Output encoding (default: from the environment)
+
+    Returns:
+        Encoded image bytes (encoding.mime_type)
+    """
+    encoding = encoding or get_header_encoding()
+    cache = get_header_cache()
+    key = _header_cache_key(title, encoding) if cache else None
+    if cache:
+        data = cache.get(key)
+        if data is not None:
+            return data
+
     # Load background (user image or gradient fallback)
     image = _load_background_image()
 
     # Add title text
     _add_title_text(image, title)
 
-    # Save image
-    image.save(output_path, "PNG", quality=95)
-    return output_path
+    data = _encode_image(image, encoding)
+    if cache:
+        try:
+            cache.put(key, data)
+        except OSError as e:
+            print(f"Warning: Could not write header cache: {e}")
+    return data
+
+
+def get_cached_header(title: str, encoding: HeaderEncoding | None = None) -> bytes | None:
+    """
+    Return a previously rendered header for this title and template, or None.
+
+    Cheap enough to call before dispatching to a render process.
+    """
+    cache = get_header_cache()
+    if cache is None:
+        return None
+    return cache.get(_header_cache_key(title, encoding or get_header_encoding()))
+
+
+def _header_cache_key(title: str, encoding: HeaderEncoding) -> str:
+    """Hash everything that determines the rendered header."""
+    payload = json.dumps(
+        {
+            "version": RENDER_VERSION,
+            "title": title,
+            "background": _background_fingerprint(),
+            "font": _font_fingerprint(),
+            "size": [IMAGE_WIDTH, IMAGE_HEIGHT],
+            "font_sizes": TITLE_FONT_SIZES,
+            "max_lines": TITLE_MAX_LINES,
+            "colors": [TEXT_COLOR, TEXT_SHADOW_COLOR],
+            "encoding": encoding._asdict(),
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@functools.lru_cache(maxsize=1)
+def _background_fingerprint() -> str:
+    """Content hash of the background image (or the gradient settings)."""
+    path = _find_background_path()
+    if path is None:
+        return f"gradient:{GRADIENT_STOPS}:{GRADIENT_ANGLE}"
+    # Content rather than mtime: a fresh CI checkout touches every file
+    return _file_digest(path)
+
+
+@functools.lru_cache(maxsize=1)
+def _font_fingerprint() -> str:
+    """Content hash of the font chain (or the default font)."""
+    chain = _resolve_font_chain()
+    return ":".join(_file_digest(path) for path in chain) if chain else "default"
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _encode_image(image: Image.Image, encoding: HeaderEncoding) -> bytes:
+    """
+    Encode the image, stepping down quality / palette size until it fits
+    in encoding.max_bytes (if set).
+
+    Returns:
+        The first encoding that fits, or the smallest one tried
+    """
+    smallest = None
+    for data in _encode_candidates(image, encoding):
+        if not encoding.max_bytes or len(data) <= encoding.max_bytes:
+            return data
+        if smallest is None or len(data) < len(smallest):
+            smallest = data
+    print(
+        f"⚠ Header image is {len(smallest)} bytes, "
+        f"over HEADER_IMAGE_MAX_BYTES ({encoding.max_bytes})"
+    )
+    return smallest
+
+
+def _encode_candidates(image: Image.Image, encoding: HeaderEncoding) -> Iterable[bytes]:
+    """Yield encodings of the image from best to smallest expected size."""
+    if encoding.format in ("png", "png8"):
+        if encoding.format == "png":
+            yield _save_to_bytes(image, "PNG", compress_level=encoding.compress_level)
+        for colors in PALETTE_STEPS:
+            palette = image.quantize(colors, method=Image.Quantize.FASTOCTREE)
+            yield _save_to_bytes(palette, "PNG", compress_level=encoding.compress_level)
+        return
+
+    qualities = [encoding.quality] + [q for q in QUALITY_STEPS if q < encoding.quality]
+    for quality in qualities:
+        if encoding.format == "jpeg":
+            subsampling = 0 if quality >= JPEG_FULL_CHROMA_QUALITY else 2
+            yield _save_to_bytes(
+                image, "JPEG", quality=quality, optimize=True, subsampling=subsampling
+            )
+        else:
+            yield _save_to_bytes(image, "WEBP", quality=quality, method=4)
+
+
+def _save_to_bytes(image: Image.Image, image_format: str, **params) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **params)
+    return buffer.getvalue()
+
+
+def create_render_pool(max_workers: int | None = None) -> ProcessPoolExecutor:
+    """
+    Create a process pool for header rendering.
+
+    Each worker parses the fonts and loads the background once at start-up
+    (warm_caches), so every header it renders afterwards only pays for
+    layout, drawing and encoding. Workers are spawned rather than forked:
+    the parent may be running an event loop, HTTP clients and a browser.
+
+    Args:
+        max_workers: Number of worker processes (default: all cores)
+
+    Returns:
+        ProcessPoolExecutor; submit render_header_bytes or
+        create_header_image to it
+    """
+    return ProcessPoolExecutor(
+        max_workers=max_workers or os.cpu_count() or 1,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=warm_caches,
+    )
+
+
+def render_headers(
+    titles: Iterable[str],
+    output_dir: str,
+    max_workers: int | None = None,
+    encoding: HeaderEncoding | None = None,
+) -> list[str]:
+    """
+    Render header images for many titles in parallel on all cores.
+
+    Args:
+        titles: Article titles
+        output_dir: Directory to write header_001.png, header_002.png, ... to
+            (extension per encoding)
+        max_workers: Number of worker processes (default: all cores)
+        encoding: Output encoding (default: from the environment)
+
+    Returns:
+        Paths of the generated images, in the order of titles
+    """
+    titles = list(titles)
+    if not titles:
+        return []
+    encoding = encoding or get_header_encoding()
+    os.makedirs(output_dir, exist_ok=True)
+    output_paths = [
+        os.path.join(output_dir, f"header_{i:03d}{encoding.extension}")
+        for i in range(1, len(titles) + 1)
+    ]
+    with create_render_pool(min(max_workers or os.cpu_count() or 1, len(titles))) as pool:
+        return list(pool.map(
+            create_header_image, titles, output_paths, [encoding] * len(titles)
+        ))
+
+
+def warm_caches() -> None:
+    """Load the background and fonts ahead of the first render."""
+    _get_background_template()
+    preload_fonts()
 
 
 def _load_background_image() -> Image.Image:
     """
     Load the user-provided background image.
     Falls back to gradient if no image is found.
+
+    Returns a fresh copy of the cached, already-resized background.
     """
+    return _get_background_template().copy()
+
+
+@functools.lru_cache(maxsize=1)
+def _get_background_template() -> Image.Image:
+    """Resolve and resize the background once per process."""
+    path = _find_background_path()
+    if path:
+        return _load_resized_background(path)
+
+    # Fallback to gradient
+    print("No background image found, using gradient fallback")
+    return _create_gradient_background()
+
+
+def _find_background_path() -> str | None:
+    """Return the user-provided background image, if any."""
     # Try multiple extensions
     for ext in [".png", ".jpg", ".jpeg"]:
         path = BACKGROUND_IMAGE_PATH.replace(".png", ext)
         if os.path.exists(path):
-            print(f"Loading background image: {path}")
-            img = Image.open(path).convert("RGB")
-            # Resize to fit note.com's recommended size
-            return img.resize((IMAGE_WIDTH, IMAGE_HEIGHT), Image.Resampling.LANCZOS)
+            return path
+    return None
 
-    # Fallback to gradient
-    print("No background image found, using gradient fallback")
-    return _create_gradient_background()
 
+def _load_resized_background(path: str) -> Image.Image:
+    """
+    Load the background resized to IMAGE_WIDTH x IMAGE_HEIGHT.
 
-def _create_gradient_background() -> Image.Image:
-    """Create a gradient background image."""
-    image = Image.new("RGB", (IMAGE_WIDTH, IMAGE_HEIGHT))
-    draw = ImageDraw.Draw(image)
+    The LANCZOS resize result is persisted as an uncompressed BMP under
+    BACKGROUND_CACHE_DIR, keyed by the source file's content hash and the
+    target size, so later runs (including fresh CI checkouts) skip both PNG
+    decoding and resizing.
+    """
+    key_source = f"{_background_fingerprint()}:{IMAGE_WIDTH}x{IMAGE_HEIGHT}"
+    key = hashlib.sha256(key_source.encode("utf-8")).hexdigest()[:16]
+    cache_path = os.path.join(BACKGROUND_CACHE_DIR, f"background_{key}.bmp")
+
+    if os.path.exists(cache_path):
+        try:
+            img = Image.open(cache_path)
+            img.load()
+            print(f"Loaded cached background image: {cache_path}")
+            return img.convert("RGB")
+        except OSError as e:
+            print(f"Warning: Ignoring unreadable background cache {cache_path}: {e}")
+
+    print(f"Loading background image: {path}")
+    img = Image.open(path).convert("RGB")
+    # Resize to fit note.com's recommended size
+    img = img.resize((IMAGE_WIDTH, IMAGE_HEIGHT), Image.Resampling.LANCZOS)
+
+    try:
+        os.makedirs(BACKGROUND_CACHE_DIR, exist_ok=True)
+        # Drop caches made from an older version of the background (finished
+        # .bmp files only: other workers' .tmp files are still being written)
+        for name in os.listdir(BACKGROUND_CACHE_DIR):
+            if (
+                name.startswith("background_")
+                and name.endswith(".bmp")
+                and name != os.path.basename(cache_path)
+            ):
+                try:
+                    os.remove(os.path.join(BACKGROUND_CACHE_DIR, name))
+                except FileNotFoundError:
+                    pass  # Removed by another worker meanwhile
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        img.save(tmp_path, "BMP")
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: Could not write background cache: {e}")
+
+    return img
+
+
+def _create_gradient_background(
+    stops: tuple[tuple[float, tuple[int, int, int]], ...] = GRADIENT_STOPS,
+    angle: float = GRADIENT_ANGLE,
+) -> Image.Image:
+    """
+    Create a gradient background image.
 
-    for y in range(IMAGE_HEIGHT):
-        # Calculate gradient ratio
-        ratio = y / IMAGE_HEIGHT
+    Args:
+        stops: (position 0.0-1.0, RGB colour) pairs, sorted by position
+        angle: Direction in degrees counter-clockwise from top-to-bottom
+            (90 = left to right)
+    """
+    return _gradient_template(tuple(stops), angle).copy()
 
-        # Interpolate colors
-        r = int(GRADIENT_START[0] + (GRADIENT_END[0] - GRADIENT_START[0]) * ratio)
-        g = int(GRADIENT_START[1] + (GRADIENT_END[1] - GRADIENT_START[1]) * ratio)
-        b = int(GRADIENT_START[2] + (GRADIENT_END[2] - GRADIENT_START[2]) * ratio)
 
-        draw.line([(0, y), (IMAGE_WIDTH, y)], fill=(r, g, b))
+@functools.lru_cache(maxsize=8)
+def _gradient_template(
+    stops: tuple[tuple[float, tuple[int, int, int]], ...], angle: float
+) -> Image.Image:
+    """
+    Build the gradient with whole-image operations, cached per colour scheme.
 
-    return image
+    A 0-255 ramp is stretched across the image along the gradient direction,
+    then mapped to colours through per-channel lookup tables.
+    """
+    radians = math.radians(angle)
+    sin_a, cos_a = abs(math.sin(radians)), abs(math.cos(radians))
+    # Extent of the image along / across the gradient direction
+    along = max(1, round(IMAGE_WIDTH * sin_a + IMAGE_HEIGHT * cos_a))
+    across = max(1, round(IMAGE_WIDTH * cos_a + IMAGE_HEIGHT * sin_a))
+
+    ramp = Image.linear_gradient("L").resize((across, along), Image.Resampling.BILINEAR)
+    if angle % 360:
+        ramp = ramp.rotate(angle, resample=Image.Resampling.BILINEAR, expand=True)
+    left = (ramp.width - IMAGE_WIDTH) // 2
+    top = (ramp.height - IMAGE_HEIGHT) // 2
+    ramp = ramp.crop((left, top, left + IMAGE_WIDTH, top + IMAGE_HEIGHT))
+
+    lut = _gradient_lut(stops)
+    channels = [ramp.point([color[c] for color in lut]) for c in range(3)]
+    return Image.merge("RGB", channels)
+
+
+def _gradient_lut(
+    stops: tuple[tuple[float, tuple[int, int, int]], ...]
+) -> list[tuple[int, int, int]]:
+    """Interpolate the colour stops into 256 colours."""
+    lut = []
+    for level in range(256):
+        position = level / 255
+        # Clamp before the first / after the last stop
+        color = stops[0][1] if position <= stops[0][0] else stops[-1][1]
+        for (pos_a, color_a), (pos_b, color_b) in zip(stops, stops[1:]):
+            if pos_a <= position <= pos_b:
+                ratio = (position - pos_a) / (pos_b - pos_a) if pos_b > pos_a else 0.0
+                color = tuple(
+                    int(color_a[c] + (color_b[c] - color_a[c]) * ratio) for c in range(3)
+                )
+                break
+        lut.append(color)
+    return lut
 
 
 def _add_title_text(image: Image.Image, title: str) -> None:
     """Add title text to the center of the image with word wrapping."""
     draw = ImageDraw.Draw(image)
 
-    # Calculate appropriate font size based on title length
-    font_size = _calculate_font_size(title)
+    # Pick the largest font size whose optimal line breaking fits
+    font_size, wrapped_lines = _layout_title(title, _resolve_font_chain())
 
-    # Select font based on content language
+    # Primary font, or a fallback chain if it lacks glyphs for the title
     font = _get_font_for_title(title, size=font_size)
 
-    # Maximum text width (80% of image width)
-    max_width = int(IMAGE_WIDTH * 0.8)
-
-    # Wrap text into multiple lines
-    wrapped_lines = _wrap_text(title, font, max_width, draw)
-
     # Calculate total text block height
     line_heights = []
     for line in wrapped_lines:
-        bbox = draw.textbbox((0, 0), line, font=font)
+        bbox = _text_bbox(draw, line, font)
         line_heights.append(bbox[3] - bbox[1])
 
     total_height = sum(line_heights) + (len(wrapped_lines) - 1) * 20  # 20px line spacing
@@ -122,7 +569,7 @@ def _add_title_text(image: Image.Image, title: str) -> None:
     # Draw each line centered
     current_y = start_y
     for i, line in enumerate(wrapped_lines):
-        bbox = draw.textbbox((0, 0), line, font=font)
+        bbox = _text_bbox(draw, line, font)
         text_width = bbox[2] - bbox[0]
         x = (IMAGE_WIDTH - text_width) // 2
 
@@ -130,71 +577,238 @@ def _add_title_text(image: Image.Image, title: str) -> None:
         # draw.text((x + 2, current_y + 2), line, font=font, fill=TEXT_SHADOW_COLOR)
 
         # Draw main text
-        draw.text((x, current_y), line, font=font, fill=TEXT_COLOR)
+        _draw_text(draw, (x, current_y), line, font, TEXT_COLOR)
 
         current_y += line_heights[i] + 20
 
 
-def _calculate_font_size(title: str) -> int:
-    """Calculate appropriate font size based on title length."""
-    length = len(title)
-    if length <= 10:
-        return 120
-    elif length <= 15:
-        return 100
-    elif length <= 20:
-        return 85
-    elif length <= 25:
-        return 70
-    elif length <= 30:
-        return 60
-    else:
-        return 50
+@functools.lru_cache(maxsize=1024)
+def _layout_title(title: str, font_chain: tuple[str, ...]) -> tuple[int, tuple[str, ...]]:
+    """
+    Choose the font size and line breaks for a title.
+
+    Tries TITLE_FONT_SIZES from largest to smallest and returns the first
+    size at which the title fits in TITLE_MAX_LINES lines (and the image
+    height) without splitting a kanji compound, broken optimally by
+    _break_lines_optimal. If every size needs a compound split, the largest
+    size that fits is used. Cached per (title, fonts); font_chain only
+    serves as part of the cache key.
+
+    Returns:
+        Tuple of (font_size, lines)
+    """
+    fallback = None
+    if len(title) <= OPTIMAL_BREAK_MAX_CHARS:
+        for size in TITLE_FONT_SIZES:
+            font = _get_font_for_title(title, size)
+            result = _break_lines_optimal(title, font, TITLE_MAX_WIDTH, TITLE_MAX_LINES)
+            if result is None:
+                continue
+            lines, _ = result
+            if _text_block_height(font, len(lines)) > TITLE_MAX_HEIGHT:
+                continue
+            if not _splits_kanji_compound(lines):
+                return size, tuple(lines)
+            fallback = fallback or (size, tuple(lines))
+
+    if fallback:
+        return fallback
+
+    # Too long for TITLE_MAX_LINES even at the smallest size
+    size = TITLE_FONT_SIZES[-1]
+    font = _get_font_for_title(title, size)
+    result = None
+    if len(title) <= OPTIMAL_BREAK_MAX_CHARS:
+        result = _break_lines_optimal(title, font, TITLE_MAX_WIDTH, allow_prohibited=True)
+    lines = result[0] if result else _wrap_text(title, font, TITLE_MAX_WIDTH)
+    return size, tuple(lines)
+
+
+def _splits_kanji_compound(lines: list[str]) -> bool:
+    """True if any line break falls between two kanji (inside a 熟語)."""
+    return any(
+        _is_kanji(line[-1]) and _is_kanji(next_line[0])
+        for line, next_line in zip(lines, lines[1:])
+        if line and next_line
+    )
+
+
+def _text_block_height(font: ImageFont.FreeTypeFont | ImageFont.ImageFont, line_count: int) -> int:
+    """Approximate height of line_count lines (with 20px line spacing)."""
+    try:
+        ascent, descent = font.getmetrics()
+    except AttributeError:
+        return 0
+    return line_count * (ascent + descent) + (line_count - 1) * 20
+
+
+def _break_lines_optimal(
+    text: str,
+    font: ImageFont.FreeTypeFont,
+    max_width: int,
+    max_lines: int | None = None,
+    allow_prohibited: bool = False,
+) -> tuple[list[str], float] | None:
+    """
+    Break text into lines minimising total badness (Knuth-Plass style).
+
+    Unlike the greedy _wrap_text, earlier breaks are revisited, so lines come
+    out balanced instead of leaving a very short last line. The fewest lines
+    that fit are used; among those, badness is the sum over lines of the
+    squared relative slack (weighted by BALANCE_WEIGHT) plus a non-negative
+    cost per break, BEST_BREAK_SCORE minus its _break_score (禁則 and
+    kanji/katakana compound penalties). 禁則 violations are ruled out unless
+    allow_prohibited is set, in which case they cost PROHIBITED_BREAK_PENALTY.
+
+    Returns:
+        Tuple of (lines, badness), or None if the text cannot fit in
+        max_lines lines
+    """
+    n = len(text)
+    if n == 0:
+        return None
+    widths = _prefix_widths(text, font)
+
+    inf = float("inf")
+    prohibited = PROHIBITED_BREAK_PENALTY if allow_prohibited else inf
+    penalties = [0.0] * (n + 1)
+    for pos in range(1, n):
+        score = _break_score(text[pos - 1], text[pos])
+        penalties[pos] = prohibited if score is None else BEST_BREAK_SCORE - score
+
+    limit = min(max_lines or n, n)
+    # cost[k][j]: best badness for text[:j] set in exactly k lines
+    cost = [[inf] * (n + 1) for _ in range(limit + 1)]
+    back = [[0] * (n + 1) for _ in range(limit + 1)]
+    cost[0][0] = 0.0
+
+    best_k = None
+    for k in range(1, limit + 1):
+        previous, current = cost[k - 1], cost[k]
+        for j in range(k, n + 1):
+            break_penalty = penalties[j] if j < n else 0.0
+            for i in range(j - 1, k - 2, -1):
+                width = widths[j] - widths[i]
+                # Lines only get wider as i moves left; a single character
+                # is always allowed its own line
+                if width > max_width and j - i > 1:
+                    break
+                if previous[i] == inf or break_penalty == inf:
+                    continue
+                slack = max(0.0, max_width - width) / max_width
+                candidate = previous[i] + BALANCE_WEIGHT * slack * slack + break_penalty
+                if candidate < current[j]:
+                    current[j] = candidate
+                    back[k][j] = i
+        # More lines would only be a fallback: stop at the first count that fits
+        if current[n] < inf:
+            best_k = k
+            break
+
+    if best_k is None:
+        return None
 
+    lines = []
+    j = n
+    for k in range(best_k, 0, -1):
+        i = back[k][j]
+        lines.append(text[i:j])
+        j = i
+    lines.reverse()
+    return lines, cost[best_k][n]
 
-def _wrap_text(text: str, font: ImageFont.FreeTypeFont, max_width: int, draw: ImageDraw.Draw) -> list[str]:
+
+def _wrap_text(text: str, font: ImageFont.FreeTypeFont, max_width: int) -> list[str]:
     """
     Wrap text to fit within max_width with Japanese line-breaking rules (禁則処理).
     Returns list of lines.
+
+    Runs in linear time: glyph widths come from cached per-character advances
+    (prefix sums), and break points are scored once up front and tracked
+    with a sliding-window maximum instead of rescanning each line.
     """
+    n = len(text)
+    widths = _prefix_widths(text, font)
+
+    # Score of breaking before text[pos] (None = prohibited), plus pos so
+    # that, as before, later break points win among equal scores
+    scores = [None] * (n + 1)
+    for pos in range(1, n):
+        score = _break_score(text[pos - 1], text[pos])
+        if score is not None:
+            scores[pos] = score + pos
+
     lines = []
-    current_line = ""
-    i = 0
-
-    while i < len(text):
-        char = text[i]
-        test_line = current_line + char
-        bbox = draw.textbbox((0, 0), test_line, font=font)
-        width = bbox[2] - bbox[0]
-
-        if width <= max_width:
-            current_line = test_line
-            i += 1
-        else:
-            # Need to break - apply 禁則処理
-            if current_line:
-                # Find the best break point
-                break_pos = _find_best_break_point(current_line, text, i)
-                if break_pos > 0 and break_pos < len(current_line):
-                    # Break at better position
-                    lines.append(current_line[:break_pos])
-                    # Remaining chars go to next line
-                    current_line = current_line[break_pos:] + char
-                    i += 1
-                else:
-                    lines.append(current_line)
-                    current_line = char
-                    i += 1
-            else:
-                current_line = char
-                i += 1
-
-    if current_line:
-        lines.append(current_line)
+    line_start = 0
+    # Candidate break positions in the current line, best score first
+    candidates: deque[int] = deque()
+
+    for i in range(n):
+        # A single over-wide character still gets its own line
+        if widths[i + 1] - widths[line_start] > max_width and i > line_start:
+            # Need to break before text[i] - apply 禁則処理
+            while candidates and candidates[0] <= line_start:
+                candidates.popleft()
+            break_pos = candidates[0] if candidates else i
+            lines.append(text[line_start:break_pos])
+            # Remaining chars and text[i] go to the next line
+            line_start = break_pos
+
+        # Breaking before text[i + 1] becomes possible once text[i] is placed
+        if i + 1 < n:
+            _push_candidate(candidates, scores, i + 1)
+
+    if line_start < n:
+        lines.append(text[line_start:])
 
     return lines if lines else [text]
 
 
+def _push_candidate(candidates: deque, scores: list, pos: int) -> None:
+    """Add a break position, keeping the deque ordered by descending score."""
+    score = scores[pos]
+    if score is None:
+        return
+    while candidates and scores[candidates[-1]] <= score:
+        candidates.pop()
+    candidates.append(pos)
+
+
+# Per-font glyph advance and kerning caches
+_advance_cache: "weakref.WeakKeyDictionary[ImageFont.FreeTypeFont, dict]" = weakref.WeakKeyDictionary()
+
+
+def _prefix_widths(text: str, font: ImageFont.FreeTypeFont) -> list[float]:
+    """
+    Return widths[k] = rendered width of text[:k].
+
+    Built from per-character advances plus pair kerning, each measured once
+    per font and cached.
+    """
+    try:
+        advances = _advance_cache.setdefault(font, {})
+    except TypeError:
+        advances = {}
+
+    widths = [0.0]
+    previous = ""
+    for char in text:
+        advance = advances.get(char)
+        if advance is None:
+            advance = advances[char] = font.getlength(char)
+        if previous:
+            pair = previous + char
+            kerning = advances.get(pair)
+            if kerning is None:
+                kerning = advances[pair] = (
+                    font.getlength(pair) - advances[previous] - advance
+                )
+            advance += kerning
+        widths.append(widths[-1] + advance)
+        previous = char
+    return widths
+
+
 # Characters that should not start a line (行頭禁則文字)
 LINE_START_PROHIBITED = set(
     # Particles (助詞)
@@ -250,141 +864,266 @@ def _get_char_type(char: str) -> str:
         return "other"
 
 
-def _find_best_break_point(current_line: str, full_text: str, next_char_idx: int) -> int:
+def _break_score(line_end: str, new_line_start: str) -> int | None:
     """
-    Find the best position to break the line according to Japanese typographic rules.
-    Returns the position in current_line where we should break.
+    Score a break between line_end and new_line_start (higher is better).
+    Returns None if the break is prohibited.
 
     Priority:
     1. Avoid breaking kanji compounds (熟語)
     2. Avoid prohibited characters at line start/end
     3. Prefer breaking at character type boundaries
     """
-    if not current_line:
-        return 0
+    # Skip if prohibited at line start
+    if new_line_start in LINE_START_PROHIBITED:
+        return None
 
-    next_char = full_text[next_char_idx] if next_char_idx < len(full_text) else ""
+    # Skip if prohibited at line end
+    if line_end in LINE_END_PROHIBITED:
+        return None
 
-    # Find all valid break points with scores
-    break_candidates = []
-
-    for pos in range(len(current_line), 0, -1):
-        # Character that would start the new line
-        if pos < len(current_line):
-            new_line_start = current_line[pos]
-        else:
-            new_line_start = next_char
+    score = 0
 
-        # Character that would end the current line
-        line_end = current_line[pos - 1] if pos > 0 else ""
+    # Get character types
+    end_type = _get_char_type(line_end) if line_end else "other"
+    start_type = _get_char_type(new_line_start) if new_line_start else "other"
 
-        # Skip if prohibited at line start
-        if new_line_start in LINE_START_PROHIBITED:
-            continue
+    # Penalize breaking in the middle of kanji sequence (熟語)
+    if end_type == "kanji" and start_type == "kanji":
+        score -= 100  # Strong penalty for breaking kanji compounds
 
-        # Skip if prohibited at line end
-        if line_end in LINE_END_PROHIBITED:
-            continue
+    # Penalize breaking in the middle of katakana sequence
+    if end_type == "katakana" and start_type == "katakana":
+        score -= 50
 
-        # Calculate score (higher is better)
-        score = 0
+    # Penalize breaking in the middle of alphabetic words
+    if end_type == "alpha" and start_type == "alpha":
+        score -= 50
 
-        # Get character types
-        end_type = _get_char_type(line_end) if line_end else "other"
-        start_type = _get_char_type(new_line_start) if new_line_start else "other"
+    # Bonus for breaking after hiragana (often particles or word endings)
+    if end_type == "hiragana" and start_type == "kanji":
+        score += 30  # Good break point: hiragana → kanji
 
-        # Penalize breaking in the middle of kanji sequence (熟語)
-        if end_type == "kanji" and start_type == "kanji":
-            score -= 100  # Strong penalty for breaking kanji compounds
+    # Bonus for breaking at character type transitions
+    if end_type != start_type:
+        score += 10
 
-        # Penalize breaking in the middle of katakana sequence
-        if end_type == "katakana" and start_type == "katakana":
-            score -= 50
+    return score
 
-        # Penalize breaking in the middle of alphabetic words
-        if end_type == "alpha" and start_type == "alpha":
-            score -= 50
 
-        # Bonus for breaking after hiragana (often particles or word endings)
-        if end_type == "hiragana" and start_type == "kanji":
-            score += 30  # Good break point: hiragana → kanji
+class FallbackFont:
+    """
+    Font chain at one size for titles the primary font cannot fully set.
 
-        # Bonus for breaking at character type transitions
-        if end_type != start_type:
-            score += 10
+    Each character is drawn with the first font in the chain whose cmap
+    covers it (see _covering_font_index). Provides the parts of the
+    FreeTypeFont interface the layout code uses (getlength, getmetrics);
+    _text_bbox and _draw_text draw it run by run.
+    """
 
-        # Prefer breaking closer to the end (less text to reflow)
-        score += pos
+    def __init__(self, fonts: dict[int, ImageFont.FreeTypeFont]):
+        """
+        Args:
+            fonts: Chain index -> font, for every index the title needs
+        """
+        self.fonts = fonts
+        ascents, descents = zip(*(font.getmetrics() for font in fonts.values()))
+        self._metrics = (max(ascents), max(descents))
+
+    def runs(self, text: str) -> list[tuple[ImageFont.FreeTypeFont, str]]:
+        """Split text into (font, substring) runs of characters set in the same font."""
+        runs = []
+        run_index, run_start = None, 0
+        for pos, char in enumerate(text):
+            index = _covering_font_index(char)
+            if index != run_index:
+                if pos > run_start:
+                    runs.append((self.fonts[run_index], text[run_start:pos]))
+                run_index, run_start = index, pos
+        if text:
+            runs.append((self.fonts[run_index], text[run_start:]))
+        return runs
+
+    def getlength(self, text: str) -> float:
+        return sum(font.getlength(run) for font, run in self.runs(text))
+
+    def getmetrics(self) -> tuple[int, int]:
+        return self._metrics
+
+
+def _text_bbox(
+    draw: ImageDraw.ImageDraw,
+    text: str,
+    font: ImageFont.FreeTypeFont | ImageFont.ImageFont | FallbackFont,
+) -> tuple[float, float, float, float]:
+    """Bounding box of text drawn at (0, 0), as ImageDraw.textbbox."""
+    if not isinstance(font, FallbackFont):
+        return draw.textbbox((0, 0), text, font=font)
+
+    # Runs share one baseline, placed as the "la" anchor would place it
+    baseline = font.getmetrics()[0]
+    x = 0.0
+    left = top = float("inf")
+    right = bottom = float("-inf")
+    for run_font, run in font.runs(text):
+        box = draw.textbbox((x, baseline), run, font=run_font, anchor="ls")
+        left, top = min(left, box[0]), min(top, box[1])
+        right, bottom = max(right, box[2]), max(bottom, box[3])
+        x += run_font.getlength(run)
+    return left, top, right, bottom
+
+
+def _draw_text(
+    draw: ImageDraw.ImageDraw,
+    xy: tuple[float, float],
+    text: str,
+    font: ImageFont.FreeTypeFont | ImageFont.ImageFont | FallbackFont,
+    fill: tuple[int, int, int],
+) -> None:
+    """Draw text with its top-left at xy, as ImageDraw.text."""
+    if not isinstance(font, FallbackFont):
+        draw.text(xy, text, font=font, fill=fill)
+        return
+
+    x, y = xy
+    baseline = y + font.getmetrics()[0]
+    for run_font, run in font.runs(text):
+        draw.text((x, baseline), run, font=run_font, fill=fill, anchor="ls")
+        x += run_font.getlength(run)
+
+
+def _get_font_for_title(
+    title: str, size: int
+) -> ImageFont.FreeTypeFont | ImageFont.ImageFont | FallbackFont:
+    """
+    Get the font for the title.
 
-        break_candidates.append((pos, score))
+    The primary font if it covers every character (the common case),
+    otherwise a FallbackFont over the chain fonts the title needs.
+    """
+    indices = tuple(sorted({_covering_font_index(char) for char in title}))
+    if indices in ((), (0,)):
+        return _get_font(size=size)
+    return _get_fallback_font(size, indices)
 
-    # If no valid candidates, return end of line
-    if not break_candidates:
-        return len(current_line)
 
-    # Return the position with highest score
-    best_pos, _ = max(break_candidates, key=lambda x: x[1])
-    return best_pos
+@functools.lru_cache(maxsize=FONT_CACHE_SIZE)
+def _get_fallback_font(size: int, indices: tuple[int, ...]) -> FallbackFont:
+    chain = _resolve_font_chain()
+    return FallbackFont({index: _load_font(chain[index], size) for index in indices})
 
 
-def _has_japanese(text: str) -> bool:
-    """Check if text contains Japanese characters (hiragana, katakana, kanji)."""
-    for char in text:
-        code = ord(char)
-        # Hiragana: U+3040-U+309F
-        # Katakana: U+30A0-U+30FF
-        # Kanji (CJK Unified Ideographs): U+4E00-U+9FFF
-        if (0x3040 <= code <= 0x309F or
-            0x30A0 <= code <= 0x30FF or
-            0x4E00 <= code <= 0x9FFF):
-            return True
-    return False
+@functools.lru_cache(maxsize=8192)
+def _covering_font_index(char: str) -> int:
+    """
+    Index in the font chain of the first font with a glyph for char.
 
+    Whitespace and characters no font covers stay with the primary font.
+    """
+    chain = _resolve_font_chain()
+    if len(chain) < 2 or char.isspace():
+        return 0
+    for index, font_path in enumerate(chain):
+        if _font_has_glyph(font_path, char):
+            return index
+    return 0
 
-def _get_font_for_title(title: str, size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
-    """Get the best available font for the title."""
-    return _get_font(size=size)
 
+def _font_has_glyph(font_path: str, char: str) -> bool:
+    coverage = _font_coverage(font_path)
+    if coverage is None:
+        return _probe_glyph(font_path, char)
+    code = ord(char)
+    return (code >> 3) < len(coverage) and bool(coverage[code >> 3] & (1 << (code & 7)))
 
-def _get_font(size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
-    """Get font with fallback chain. RocknRoll One is primary (supports Japanese)."""
-    font_paths = [
-        # Primary: RocknRoll One (supports Japanese and English)
-        os.path.join(ASSETS_DIR, "RocknRollOne.ttf"),
-        # Secondary: Other custom fonts
-        os.path.join(ASSETS_DIR, "DelaGothicOne.ttf"),
-        os.path.join(ASSETS_DIR, "Pacifico.ttf"),
-        # Tertiary: macOS system fonts
-        "/System/Library/Fonts/ヒラギノ角ゴシック W6.ttc",
-        "/System/Library/Fonts/ヒラギノ角ゴシック W3.ttc",
-        # Tertiary: Other macOS fonts
-        "/Library/Fonts/Arial Unicode.ttf",
-        "/System/Library/Fonts/Hiragino Sans GB.ttc",
-        # Linux (GitHub Actions) - CJK fonts
-        "/usr/share/fonts/opentype/noto/NotoSansCJK-Bold.ttc",
-        "/usr/share/fonts/truetype/noto/NotoSansCJK-Bold.ttc",
-        "/usr/share/fonts/opentype/noto/NotoSansCJKjp-Bold.otf",
-        "/usr/share/fonts/truetype/fonts-japanese-gothic.ttf",
-        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
-        # Windows
-        "C:/Windows/Fonts/msgothic.ttc",
-        "C:/Windows/Fonts/meiryo.ttc",
-        "C:/Windows/Fonts/YuGothB.ttc",
-    ]
 
-    for font_path in font_paths:
+@functools.lru_cache(maxsize=None)
+def _font_coverage(font_path: str) -> bytes | None:
+    """
+    Bitmap of the codepoints mapped by the font's cmap (bit code of byte
+    code >> 3), read once per font. None if fontTools is not installed or
+    the cmap cannot be read.
+    """
+    if TTFont is None:
+        return None
+    try:
+        font = TTFont(font_path, fontNumber=0, lazy=True)
+        try:
+            codepoints = list(font.getBestCmap() or ())
+        finally:
+            font.close()
+    except Exception as e:
+        print(f"Warning: Could not read the cmap of {font_path}: {e}")
+        return None
+
+    bitmap = bytearray((max(codepoints, default=0) >> 3) + 1)
+    for code in codepoints:
+        bitmap[code >> 3] |= 1 << (code & 7)
+    return bytes(bitmap)
+
+
+@functools.lru_cache(maxsize=8192)
+def _probe_glyph(font_path: str, char: str) -> bool:
+    """Without fontTools: a glyph is missing if it renders as .notdef."""
+    return _glyph_mask(font_path, char) != _glyph_mask(font_path, NOTDEF_PROBE_CHAR)
+
+
+@functools.lru_cache(maxsize=8192)
+def _glyph_mask(font_path: str, char: str) -> tuple[tuple[int, int], bytes]:
+    mask = _load_font(font_path, GLYPH_PROBE_SIZE).getmask(char)
+    return mask.size, bytes(mask)
+
+
+@functools.lru_cache(maxsize=1)
+def _resolve_font_chain() -> tuple[str, ...]:
+    """
+    Loadable fonts from FONT_PATHS, primary first (resolved once per process).
+    The rest serve as glyph fallbacks.
+    """
+    chain = []
+    for font_path in FONT_PATHS:
         if os.path.exists(font_path):
             try:
-                font = ImageFont.truetype(font_path, size)
-                print(f"✓ Loaded font: {font_path}")
-                return font
+                ImageFont.truetype(font_path, FONT_PRELOAD_SIZES[-1])
             except (OSError, IOError) as e:
                 print(f"✗ Failed to load {font_path}: {e}")
                 continue
+            if not chain:
+                print(f"✓ Loaded font: {font_path}")
+            chain.append(font_path)
+
+    if not chain:
+        print("⚠ Using default font (Japanese font not found)")
+    elif len(chain) > 1:
+        print(f"✓ {len(chain) - 1} fallback font(s) for missing glyphs")
+    return tuple(chain)
+
+
+def _resolve_font_path() -> str | None:
+    """The primary font, or None if no font in FONT_PATHS loads."""
+    chain = _resolve_font_chain()
+    return chain[0] if chain else None
+
+
+@functools.lru_cache(maxsize=FONT_CACHE_SIZE)
+def _get_font(size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
+    """Get font with fallback chain. RocknRoll One is primary (supports Japanese)."""
+    font_path = _resolve_font_path()
+    if font_path is None:
+        # Fall back to default font
+        return ImageFont.load_default()
+    return _load_font(font_path, size)
+
+
+@functools.lru_cache(maxsize=FONT_CACHE_SIZE * 2)
+def _load_font(font_path: str, size: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(font_path, size)
+
 
-    # Fall back to default font
-    print("⚠ Using default font (Japanese font not found)")
-    return ImageFont.load_default()
+def preload_fonts(sizes: tuple[int, ...] = FONT_PRELOAD_SIZES) -> None:
+    """Parse the font for every size _layout_title can choose."""
+    for size in sizes:
+        _get_font(size)
 
 
 if __name__ == "__main__":
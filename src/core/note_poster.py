@@ -3,72 +3,227 @@ Playwright-based automation for note.com article posting.
 """
 
 import os
-import time
 import json
 import platform
-from playwright.sync_api import sync_playwright, Page
+from playwright.sync_api import (
+    sync_playwright,
+    FilePayload,
+    Locator,
+    Page,
+    TimeoutError as PlaywrightTimeoutError,
+)
 
 
 NOTE_NEW_ARTICLE_URL = "https://note.com/notes/new"
 
+# File name (without extension) reported to note.com for in-memory header images
+HEADER_IMAGE_BASENAME = "header"
+
+# Readiness waits: these are upper bounds, the waits resolve as soon as the
+# page signals readiness (DOM quiet, dialog shown/hidden, save response).
+EDITOR_QUIET_MS = 400
+EDITOR_SETTLE_TIMEOUT_MS = 10000
+EDITOR_READY_TIMEOUT_MS = 10000
+MENU_TIMEOUT_MS = 3000
+DIALOG_TIMEOUT_MS = 15000
+DRAFT_SAVE_TIMEOUT_MS = 10000
+
+EDITOR_SELECTOR = '.ProseMirror, [contenteditable="true"]'
+DIALOG_SELECTOR = '[role="dialog"], .ReactModal__Content, [class*="Modal"]'
+# The crop dialog's own save button (exact text, so never the header's 下書き保存)
+CROP_SAVE_BUTTON_SELECTOR = 'button:text-is("保存")'
+UPLOAD_MENU_SELECTOR = 'text=画像をアップロード'
+
+# Resolves once the editor has seen no DOM mutations for `quietMs`
+# (or after `timeoutMs` at the latest).
+_WAIT_FOR_DOM_QUIET_JS = """
+([selector, quietMs, timeoutMs]) => new Promise((resolve) => {
+    const target = document.querySelector(selector) || document.body;
+    let timer = null;
+    const done = (settled) => {
+        observer.disconnect();
+        clearTimeout(timer);
+        clearTimeout(deadline);
+        resolve(settled);
+    };
+    const observer = new MutationObserver(() => {
+        clearTimeout(timer);
+        timer = setTimeout(() => done(true), quietMs);
+    });
+    observer.observe(target, {
+        childList: true, subtree: true, characterData: true, attributes: true,
+    });
+    timer = setTimeout(() => done(true), quietMs);
+    const deadline = setTimeout(() => done(false), timeoutMs);
+})
+"""
 
-def post_draft_to_note(
-    title: str,
-    body: str,
-    state_file: str | None = None,
-    header_image_path: str | None = None
-) -> bool:
-    """
-    Post an article as a draft to note.com using saved session state.
 
-    Args:
-        title: Article title
-        body: Article body (Markdown)
-        state_file: Path to note-state.json file (defaults to ./note-state.json)
-        header_image_path: Path to header image file (optional)
-
-    Returns:
-        True if successful, False otherwise
+class NotePosterSession:
     """
-    state_file = state_file or os.environ.get("NOTE_STATE_FILE", "./note-state.json")
+    Reusable note.com posting session.
 
-    if not os.path.exists(state_file):
-        raise FileNotFoundError(
-            f"Session state file not found: {state_file}\n"
-            f"Please run 'node login-note.js' first to generate the session state."
-        )
+    Launches Chromium and builds the authenticated browser context once,
+    then posts any number of drafts, each on a fresh page in that context.
+    Must be opened, used and closed from the same thread (Playwright's sync
+    API is thread-bound).
 
-    with sync_playwright() as p:
-        # Use headed mode with xvfb for proper JavaScript execution
-        # GitHub Actions uses xvfb-run to provide virtual display
-        browser = p.chromium.launch(headless=False)
+    Usage:
+        with NotePosterSession() as session:
+            session.post_draft(title, body, header_image=png_bytes)
+    """
 
-        # Create context with session state
-        context_options = {
-            "viewport": {"width": 1280, "height": 800},
-            "locale": "ja-JP",
-            "storage_state": state_file,
-        }
+    def __init__(self, state_file: str | None = None):
+        """
+        Args:
+            state_file: Path to note-state.json file (defaults to ./note-state.json)
+        """
+        self.state_file = state_file or os.environ.get("NOTE_STATE_FILE", "./note-state.json")
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._page: Page | None = None
+
+    def __enter__(self) -> "NotePosterSession":
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    @property
+    def is_open(self) -> bool:
+        return self._context is not None and self._browser_connected()
+
+    def _browser_connected(self) -> bool:
+        try:
+            return self._browser is not None and self._browser.is_connected()
+        except Exception:
+            return False  # Driver gone
+
+    def open(self) -> None:
+        """
+        Launch the browser and create the authenticated context.
+
+        Reuses the running browser; relaunches if it crashed or the driver
+        disconnected since the last article.
+        """
+        if self.is_open:
+            return
+        if self._context is not None:
+            print("Warning: Browser connection lost, relaunching")
+            self.close()
+
+        if not os.path.exists(self.state_file):
+            raise FileNotFoundError(
+                f"Session state file not found: {self.state_file}\n"
+                f"Please run 'node login-note.js' first to generate the session state."
+            )
 
+        # Parse the session state once and hand the parsed dict to Playwright
+        storage_state: dict | str = self.state_file
         try:
-            with open(state_file, 'r') as f:
-                state = json.load(f)
-                cookies_count = len(state.get('cookies', []))
+            with open(self.state_file, 'r') as f:
+                storage_state = json.load(f)
+                cookies_count = len(storage_state.get('cookies', []))
                 print(f"✓ Loaded {cookies_count} cookies from session state")
         except (json.JSONDecodeError, FileNotFoundError) as e:
             print(f"Warning: Could not load session state: {e}")
 
-        context = browser.new_context(**context_options)
-        page = context.new_page()
+        self._playwright = sync_playwright().start()
+        try:
+            # Use headed mode with xvfb for proper JavaScript execution
+            # GitHub Actions uses xvfb-run to provide virtual display
+            self._browser = self._playwright.chromium.launch(headless=False)
+
+            # Create context with session state
+            self._context = self._browser.new_context(
+                viewport={"width": 1280, "height": 800},
+                locale="ja-JP",
+                storage_state=storage_state,
+            )
+        except Exception:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        """Tear down the page, context, browser and Playwright driver."""
+        for resource in (self._page, self._context, self._browser):
+            if resource is not None:
+                try:
+                    resource.close()
+                except Exception as e:
+                    print(f"Warning: Failed to close browser resource: {e}")
+        if self._playwright is not None:
+            try:
+                self._playwright.stop()
+            except Exception as e:
+                print(f"Warning: Failed to stop Playwright: {e}")
+
+        self._page = None
+        self._context = None
+        self._browser = None
+        self._playwright = None
+
+    def _new_page(self) -> Page:
+        """Replace the previous article's page with a fresh one."""
+        if self._page is not None:
+            try:
+                self._page.close()
+            except Exception:
+                pass
+        self._page = self._context.new_page()
+        return self._page
+
+    def post_draft(
+        self,
+        title: str,
+        body: str,
+        header_image_path: str | None = None,
+        header_image: bytes | None = None,
+        header_image_mime_type: str = "image/png",
+        header_image_extension: str = ".png",
+    ) -> bool:
+        """
+        Post an article as a draft to note.com.
+
+        Args:
+            title: Article title
+            body: Article body (Markdown)
+            header_image_path: Path to header image file (optional)
+            header_image: Encoded header image, uploaded straight from
+                memory (optional, takes precedence over header_image_path)
+            header_image_mime_type: MIME type of header_image
+            header_image_extension: File extension matching the MIME type
+
+        Returns:
+            True if successful, False otherwise
+        """
+        self.open()
+        try:
+            page = self._new_page()
+        except Exception:
+            # The context or browser died: relaunch for the next article
+            self.close()
+            raise
 
         try:
             # Navigate to new article page directly (session already authenticated)
             _navigate_to_new_article(page)
 
             # Upload header image if provided
-            if header_image_path and os.path.exists(header_image_path):
+            image: str | FilePayload | None = None
+            if header_image:
+                image = {
+                    "name": HEADER_IMAGE_BASENAME + header_image_extension,
+                    "mimeType": header_image_mime_type,
+                    "buffer": header_image,
+                }
+            elif header_image_path and os.path.exists(header_image_path):
+                image = header_image_path
+            if image:
                 try:
-                    _upload_header_image(page, header_image_path)
+                    _upload_header_image(page, image)
                 except Exception as e:
                     print(f"Warning: Header image upload failed: {e}")
                     # Continue without header image
@@ -83,13 +238,106 @@ def post_draft_to_note(
 
         except Exception as e:
             print(f"Error during note automation: {e}")
-            # Take screenshot for debugging
-            page.screenshot(path="error_screenshot.png")
+            if page.is_closed() or not self._browser_connected():
+                # Browser-level failure: the next article gets a fresh browser
+                print("Browser or page crashed, closing the session")
+                self.close()
+            else:
+                # Take screenshot for debugging
+                page.screenshot(path="error_screenshot.png")
             raise
 
-        finally:
-            context.close()
-            browser.close()
+
+def post_draft_to_note(
+    title: str,
+    body: str,
+    state_file: str | None = None,
+    header_image_path: str | None = None,
+    header_image: bytes | None = None,
+    header_image_mime_type: str = "image/png",
+    header_image_extension: str = ".png",
+) -> bool:
+    """
+    Post a single article as a draft to note.com using saved session state.
+
+    Opens and closes a dedicated browser session; use NotePosterSession to
+    post several articles with one browser.
+
+    Args:
+        title: Article title
+        body: Article body (Markdown)
+        state_file: Path to note-state.json file (defaults to ./note-state.json)
+        header_image_path: Path to header image file (optional)
+        header_image: Encoded header image bytes (optional)
+        header_image_mime_type: MIME type of header_image
+        header_image_extension: File extension matching the MIME type
+
+    Returns:
+        True if successful, False otherwise
+    """
+    with NotePosterSession(state_file) as session:
+        return session.post_draft(
+            title,
+            body,
+            header_image_path=header_image_path,
+            header_image=header_image,
+            header_image_mime_type=header_image_mime_type,
+            header_image_extension=header_image_extension,
+        )
+
+
+def _wait_for_editor_settled(page: Page, timeout_ms: int = EDITOR_SETTLE_TIMEOUT_MS) -> None:
+    """Wait until the editor DOM stops changing (ProseMirror re-renders done)."""
+    try:
+        settled = page.evaluate(
+            _WAIT_FOR_DOM_QUIET_JS,
+            [EDITOR_SELECTOR, EDITOR_QUIET_MS, timeout_ms],
+        )
+        if not settled:
+            print(f"  Editor still changing after {timeout_ms}ms, continuing")
+    except Exception as e:
+        print(f"  Editor settle wait failed: {str(e)[:50]}")
+
+
+def _wait_for_state(locator: Locator, state: str, timeout_ms: int) -> bool:
+    """Wait for the first element matching locator to reach state; False on timeout."""
+    try:
+        locator.first.wait_for(state=state, timeout=timeout_ms)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+
+def _crop_dialog(page: Page) -> Locator:
+    """The image crop dialog: a dialog that contains the non-下書き 保存 button."""
+    return page.locator(DIALOG_SELECTOR).filter(has=page.locator(CROP_SAVE_BUTTON_SELECTOR))
+
+
+def _is_draft_save_response(response) -> bool:
+    """Match note.com's draft save API call."""
+    return (
+        response.request.method in ("POST", "PUT")
+        and "/api/" in response.url
+        and ("draft" in response.url or "text_notes" in response.url)
+    )
+
+
+def _wait_for_draft_save(page: Page, trigger) -> bool:
+    """Run trigger() and wait for the draft save response; False on timeout."""
+    try:
+        with page.expect_response(
+            _is_draft_save_response, timeout=DRAFT_SAVE_TIMEOUT_MS
+        ) as response_info:
+            trigger()
+        print(f"  Draft save response: {response_info.value.url}")
+        return True
+    except PlaywrightTimeoutError:
+        # Either the save is slow or the URL pattern no longer matches note.com's API
+        print(
+            f"Warning: No draft save response matched within {DRAFT_SAVE_TIMEOUT_MS}ms "
+            "(check _is_draft_save_response against the requests in the trace)"
+        )
+        return False
 
 
 def _navigate_to_new_article(page: Page) -> None:
@@ -138,12 +386,13 @@ def _navigate_to_new_article(page: Page) -> None:
             f.write(page.content())
         print("Debug HTML saved to page_content_debug.html")
 
-    time.sleep(2)  # Additional wait
+    # Wait for the editor to finish its initial rendering
+    _wait_for_editor_settled(page)
 
     print("✓ Successfully navigated to new article page")
 
 
-def _upload_header_image(page: Page, image_path: str) -> None:
+def _upload_header_image(page: Page, image: str | FilePayload) -> None:
     """
     Upload a header image (見出し画像) to the article.
 
@@ -155,12 +404,13 @@ def _upload_header_image(page: Page, image_path: str) -> None:
 
     Args:
         page: Playwright Page object
-        image_path: Absolute path to the image file to upload
+        image: Path to the image file, or an in-memory file payload
+            ({"name", "mimeType", "buffer"})
     """
-    print(f"Uploading header image: {image_path}")
-
-    # Wait for the page to be fully loaded
-    time.sleep(2)
+    if isinstance(image, str):
+        print(f"Uploading header image: {image}")
+    else:
+        print(f"Uploading header image from memory ({len(image['buffer'])} bytes)")
 
     # Save page HTML for debugging
     with open("page_content.html", "w", encoding="utf-8") as f:
@@ -196,7 +446,6 @@ def _upload_header_image(page: Page, image_path: str) -> None:
                     element.first.click()
                     print(f"Clicked header icon: {selector}")
                     header_clicked = True
-                    time.sleep(1)
                     break
         except Exception as e:
             print(f"  Selector '{selector}' failed: {str(e)[:30]}")
@@ -220,7 +469,6 @@ def _upload_header_image(page: Page, image_path: str) -> None:
                     click_y = box['y'] - 80  # Above the title
                     print(f"Clicking at position ({click_x}, {click_y})")
                     page.mouse.click(click_x, click_y)
-                    time.sleep(1)
                     header_clicked = True
         except Exception as e:
             print(f"Position-based click failed: {e}")
@@ -231,7 +479,8 @@ def _upload_header_image(page: Page, image_path: str) -> None:
         raise RuntimeError("Could not find header image area to click")
 
     # Wait for dropdown/menu to appear
-    time.sleep(1)
+    if not _wait_for_state(page.locator(UPLOAD_MENU_SELECTOR), "visible", MENU_TIMEOUT_MS):
+        print("  Upload menu not visible yet, trying fallbacks")
 
     # Take screenshot after clicking header area
     page.screenshot(path="after_header_click.png")
@@ -274,23 +523,24 @@ def _upload_header_image(page: Page, image_path: str) -> None:
                 print("Upload option not found, trying direct file input...")
                 file_input = page.locator('input[type="file"]')
                 if file_input.count() > 0:
-                    file_input.first.set_input_files(image_path)
+                    file_input.first.set_input_files(image)
                     print("Used direct file input")
                     return
                 raise RuntimeError("Could not find upload option in dropdown")
 
         # Handle file chooser
         file_chooser = fc_info.value
-        file_chooser.set_files(image_path)
+        file_chooser.set_files(image)
         print("Header image file selected")
 
-        # Wait for upload processing
-        time.sleep(3)
-
         # Step 3: Handle the image crop/position dialog
         # Look for 保存 button in the dialog (not the header's 下書き保存)
-        # Wait for dialog to fully load
-        time.sleep(2)
+        # Wait for the dialog to appear once the upload has been processed
+        crop_dialog = _crop_dialog(page)
+        if _wait_for_state(crop_dialog, "visible", DIALOG_TIMEOUT_MS):
+            print("Crop dialog is visible")
+        else:
+            print(f"  Crop dialog not detected after {DIALOG_TIMEOUT_MS}ms, continuing")
 
         # Take screenshot before clicking save
         page.screenshot(path="before_image_save.png")
@@ -319,7 +569,6 @@ def _upload_header_image(page: Page, image_path: str) -> None:
                     button.click()
                     print(f"Clicked dialog save button: '{button_text}'")
                     save_clicked = True
-                    time.sleep(2)
                     break
         except Exception as e:
             print(f"Method 1 failed: {e}")
@@ -339,7 +588,6 @@ def _upload_header_image(page: Page, image_path: str) -> None:
                     print(f"Clicking at estimated position ({click_x}, {click_y})")
                     page.mouse.click(click_x, click_y)
                     save_clicked = True
-                    time.sleep(2)
             except Exception as e:
                 print(f"Method 2 failed: {e}")
 
@@ -347,7 +595,10 @@ def _upload_header_image(page: Page, image_path: str) -> None:
         if not save_clicked:
             print("WARNING: Could not find save button, trying keyboard Enter...")
             page.keyboard.press("Enter")
-            time.sleep(2)
+
+        # The dialog closes once the cropped image has been applied
+        if not _wait_for_state(crop_dialog, "hidden", DIALOG_TIMEOUT_MS):
+            print(f"  Crop dialog still visible after {DIALOG_TIMEOUT_MS}ms")
 
         print("✓ Header image upload completed")
 
@@ -362,9 +613,6 @@ def _input_article_content(page: Page, title: str, body: str) -> None:
     """Input article title and body."""
     print("Inputting article content...")
 
-    # Wait a bit more for elements to be interactive
-    time.sleep(2)
-
     # Input title
     title_input = page.locator('[placeholder*="タイトル"]').or_(
         page.locator('.o-noteEditorTextarea__title')
@@ -374,12 +622,14 @@ def _input_article_content(page: Page, title: str, body: str) -> None:
         page.locator('textarea').first
     )
 
+    # Wait for the title input to become interactive
+    if not _wait_for_state(title_input, "visible", EDITOR_READY_TIMEOUT_MS):
+        print(f"  Title input not visible after {EDITOR_READY_TIMEOUT_MS}ms, continuing")
+
     if title_input.count() > 0:
         print("Found title input, filling...")
         title_input.first.click()
-        time.sleep(0.3)
         title_input.first.fill(title)
-        time.sleep(0.5)
         print(f"Title filled: {title}")
         # Debug: Check if title was actually filled
         title_value = page.locator('input, textarea').first.input_value() if page.locator('input, textarea').count() > 0 else "N/A"
@@ -402,7 +652,6 @@ def _input_article_content(page: Page, title: str, body: str) -> None:
         print("Found body editor, pasting content via clipboard...")
         editor_element = body_editor.first
         editor_element.click()
-        time.sleep(0.5)
 
         # Use clipboard paste - this is required for note.com to recognize markdown
         # note.com converts markdown to proper formatting only when pasting from clipboard
@@ -414,7 +663,6 @@ def _input_article_content(page: Page, title: str, body: str) -> None:
                 }""",
                 body
             )
-            time.sleep(0.3)
 
             # Paste using keyboard shortcut (Ctrl+V or Cmd+V)
             # Use Meta for Mac, Control for Linux (GitHub Actions runs on Linux)
@@ -424,14 +672,12 @@ def _input_article_content(page: Page, title: str, body: str) -> None:
                 page.keyboard.press("Control+v")
 
             print("Body pasted using clipboard")
-            time.sleep(1)
         except Exception as e:
             print(f"Clipboard paste failed: {e}, trying alternative method...")
             # Fallback: Use Playwright's built-in clipboard
             try:
                 # Focus and select all first
                 editor_element.click()
-                time.sleep(0.3)
 
                 # Type the content line by line with Enter key
                 # This helps note.com recognize markdown better
@@ -456,7 +702,8 @@ def _input_article_content(page: Page, title: str, body: str) -> None:
         print(f"Debug - contenteditable elements: {page.locator('[contenteditable=true]').count()}")
         print(f"Debug - ProseMirror elements: {page.locator('.ProseMirror').count()}")
 
-    time.sleep(1)
+    # Wait for ProseMirror to finish converting the pasted markdown
+    _wait_for_editor_settled(page)
     print("Article content input complete")
 
 
@@ -484,20 +731,17 @@ def _save_draft(page: Page) -> None:
 
         if draft_button.count() > 0:
             print(f"Found draft button, clicking...")
-            draft_button.first.click()
-            time.sleep(5)  # Wait for save to complete
-            print("Draft saved successfully")
+            if _wait_for_draft_save(page, draft_button.first.click):
+                print("Draft saved successfully")
         else:
             print("Draft button not found, trying keyboard shortcut...")
             # Try Cmd+S on Mac
-            page.keyboard.press("Meta+s")
-            time.sleep(3)
+            _wait_for_draft_save(page, lambda: page.keyboard.press("Meta+s"))
             print("Attempted keyboard shortcut save (Cmd+S)")
 
     except Exception as e:
         print(f"Error during save: {e}")
-        page.keyboard.press("Meta+s")
-        time.sleep(2)
+        _wait_for_draft_save(page, lambda: page.keyboard.press("Meta+s"))
 
     # Take screenshot after saving
     page.screenshot(path="after_save_screenshot.png")
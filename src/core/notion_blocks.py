@@ -0,0 +1,89 @@
+"""
+Flatten Notion page body blocks into Markdown-ish plain text.
+
+Input is the block tree fetched by AsyncNotionClient.fetch_page_body: block
+objects as returned by GET /blocks/{id}/children, each with its own
+children (if any) under the "children" key.
+"""
+
+# Nested blocks (list items, toggles, ...) are indented by this much per level
+INDENT = "  "
+
+# Blocks whose children are separate pages, never inlined into the body
+SEPARATE_PAGE_TYPES = {"child_page", "child_database"}
+
+HEADING_PREFIXES = {
+    "heading_1": "# ",
+    "heading_2": "## ",
+    "heading_3": "### ",
+}
+
+
+def blocks_to_text(blocks: list[dict], depth: int = 0) -> str:
+    """
+    Convert a block tree into Markdown-ish text.
+
+    Headings, lists, to-dos, quotes, code and tables keep their Markdown
+    markers; media blocks contribute their caption or URL only.
+
+    Args:
+        blocks: Sibling blocks, in page order
+        depth: Nesting level (indentation) of these blocks
+
+    Returns:
+        One line (or more, for code and tables) per block
+    """
+    lines: list[str] = []
+    number = 0
+    for block in blocks:
+        block_type = block.get("type", "")
+        # Numbered lists restart after any other block
+        number = number + 1 if block_type == "numbered_list_item" else 0
+
+        text = _block_text(block, number)
+        indent = INDENT * depth
+        if text is not None:
+            lines.extend(indent + line if line else line for line in text.split("\n"))
+
+        children = block.get("children")
+        if children:
+            lines.append(blocks_to_text(children, depth + 1))
+    return "\n".join(lines)
+
+
+def _block_text(block: dict, number: int) -> str | None:
+    """Text of one block without its children (None = block contributes nothing)."""
+    block_type = block.get("type", "")
+    data = block.get(block_type) or {}
+    text = _rich_text(data.get("rich_text"))
+
+    if block_type in HEADING_PREFIXES:
+        return HEADING_PREFIXES[block_type] + text
+    if block_type == "bulleted_list_item":
+        return "- " + text
+    if block_type == "numbered_list_item":
+        return f"{number}. " + text
+    if block_type == "to_do":
+        return ("- [x] " if data.get("checked") else "- [ ] ") + text
+    if block_type in ("quote", "callout"):
+        return "\n".join("> " + line for line in text.split("\n"))
+    if block_type == "code":
+        return f"```{data.get('language', '')}\n{text}\n```"
+    if block_type == "divider":
+        return "---"
+    if block_type == "equation":
+        return data.get("expression", "")
+    if block_type == "table_row":
+        return "| " + " | ".join(_rich_text(cell) for cell in data.get("cells", [])) + " |"
+    if block_type in ("bookmark", "embed", "link_preview"):
+        return data.get("url") or None
+    if block_type in ("image", "video", "file", "pdf", "audio"):
+        return _rich_text(data.get("caption")) or None
+    if block_type in SEPARATE_PAGE_TYPES or "rich_text" not in data:
+        return None
+    # paragraph, toggle and any other text-bearing block
+    return text
+
+
+def _rich_text(rich_text: list[dict] | None) -> str:
+    return "".join(part.get("plain_text", "") for part in rich_text or [])
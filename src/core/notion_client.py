@@ -2,13 +2,45 @@
 Notion API client for fetching and updating articles.
 """
 
+import asyncio
+import atexit
+import json
 import os
 import sys
+import threading
+from typing import AsyncIterator, Iterator
+
 import httpx
 
+# HTTP/2 needs the optional `h2` package (pip install "httpx[http2]")
+try:
+    import h2  # noqa: F401
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+# Large query results decode noticeably faster with the optional `orjson`
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 # Add parent directory to path for config import
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config import NOTION_API_BASE, DEFAULT_MODE
+from config import (
+    NOTION_API_BASE,
+    DEFAULT_MODE,
+    NOTION_RATE_LIMIT,
+    NOTION_MAX_RETRIES,
+    NOTION_BLOCK_MAX_DEPTH,
+    env_flag,
+    env_int,
+)
+from core.article import Article
+from core.notion_blocks import SEPARATE_PAGE_TYPES, blocks_to_text
+from core.notion_schema import ExtractionPlan, compile_extraction_plan
+from core.rate_limiter import NotionRequestScheduler, PRIORITY_HIGH, PRIORITY_NORMAL
 
 
 def get_notion_headers() -> dict:
@@ -23,55 +55,428 @@ def get_notion_headers() -> dict:
     }
 
 
-def fetch_ready_articles(database_id: str) -> list[dict]:
-    """
-    Fetch articles with Status = 'Ready' from the Notion database.
+READY_FILTER = {
+    "property": "Status",
+    "status": {
+        "equals": "Ready"
+    }
+}
 
-    Returns:
-        List of article records with id, title, mode, and content.
-    """
-    articles = []
-    has_more = True
-    start_cursor = None
-    headers = get_notion_headers()
-
-    while has_more:
-        payload = {
-            "filter": {
-                "property": "Status",
-                "status": {
-                    "equals": "Ready"
-                }
-            }
+DONE_PROPERTIES = {
+    "Status": {
+        "status": {
+            "name": "Done"
         }
+    }
+}
 
-        if start_cursor:
-            payload["start_cursor"] = start_cursor
 
-        response = httpx.post(
-            f"{NOTION_API_BASE}/databases/{database_id}/query",
-            headers=headers,
-            json=payload,
-            timeout=30.0,
+class AsyncNotionClient:
+    """
+    Async Notion API client sharing one pooled, keep-alive connection.
+
+    Headers are built once and HTTP/2 is used when the `h2` package is
+    installed, so many requests (e.g. marking a batch of pages as Done)
+    multiplex over a single connection instead of a handshake each.
+    Every request goes through a NotionRequestScheduler (rate limit,
+    priorities, 429/Retry-After handling); pass the same scheduler to
+    several clients to make them share one budget.
+
+    Usage:
+        async with AsyncNotionClient() as notion:
+            articles = await notion.fetch_ready_articles(database_id)
+            await notion.mark_many_as_done([a.id for a in articles])
+    """
+
+    def __init__(
+        self,
+        timeout: float = 30.0,
+        max_connections: int = 10,
+        scheduler: NotionRequestScheduler | None = None,
+    ):
+        self._scheduler = scheduler or NotionRequestScheduler(
+            rate=env_int("NOTION_RATE_LIMIT", NOTION_RATE_LIMIT),
+            max_retries=env_int("NOTION_MAX_RETRIES", NOTION_MAX_RETRIES, minimum=0),
+        )
+        self._client = httpx.AsyncClient(
+            base_url=NOTION_API_BASE,
+            headers=get_notion_headers(),
+            http2=_HTTP2_AVAILABLE,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+        # Compiled once per database and run
+        self._plans: dict[str, ExtractionPlan | None] = {}
+
+    async def __aenter__(self) -> "AsyncNotionClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close the underlying connection pool."""
+        await self._client.aclose()
+
+    async def _request(
+        self, method: str, path: str, priority: int = PRIORITY_NORMAL, **kwargs
+    ) -> dict:
+        """Send a rate-limited request and return the decoded JSON body."""
+        response = await self._scheduler.send(
+            lambda: self._client.request(method, path, **kwargs), priority
         )
         if response.status_code != 200:
             print(f"Error response: {response.text}")
         response.raise_for_status()
-        data = response.json()
+        return _json_loads(response.content)
+
+    async def query_database(
+        self,
+        database_id: str,
+        start_cursor: str | None = None,
+        filter_properties: list[str] | None = None,
+        edited_after: str | None = None,
+    ) -> dict:
+        """
+        Query one page (up to 100 results) of Ready articles.
+
+        Args:
+            database_id: Notion database ID
+            start_cursor: Cursor from the previous page of results
+            filter_properties: Property IDs to return (default: all)
+            edited_after: Only pages edited on or after this ISO timestamp
+        """
+        query_filter = READY_FILTER
+        if edited_after:
+            query_filter = {"and": [READY_FILTER, {
+                "timestamp": "last_edited_time",
+                "last_edited_time": {"on_or_after": edited_after},
+            }]}
+        payload = {"filter": query_filter}
+        if start_cursor:
+            payload["start_cursor"] = start_cursor
+        params = {"filter_properties": filter_properties} if filter_properties else None
+        return await self._request(
+            "POST", f"/databases/{database_id}/query", json=payload, params=params
+        )
 
-        for page in data.get("results", []):
-            article = {
-                "id": page["id"],
-                "title": _extract_title(page),
-                "mode": _extract_mode(page),
-                "content": _extract_content(page),
-            }
-            articles.append(article)
+    async def get_extraction_plan(self, database_id: str) -> ExtractionPlan | None:
+        """
+        Retrieve the database schema once and compile it into an ExtractionPlan.
+
+        Returns:
+            The plan, or None if the schema could not be read (pages are
+            then decoded by probing candidate properties)
+        """
+        if database_id not in self._plans:
+            try:
+                database = await self._request("GET", f"/databases/{database_id}")
+                self._plans[database_id] = compile_extraction_plan(database)
+            except httpx.HTTPError as e:
+                print(f"Warning: Could not read the database schema ({e}), probing properties")
+                self._plans[database_id] = None
+        return self._plans[database_id]
+
+    async def fetch_ready_articles(
+        self, database_id: str, include_body: bool | None = None
+    ) -> list[Article]:
+        """
+        Fetch articles with Status = 'Ready' from the Notion database.
+
+        Args:
+            database_id: Notion database ID
+            include_body: Append each page's body text to its content
+                (default: the NOTION_FETCH_PAGE_BODY environment variable)
+
+        Returns:
+            List of Article records (id, title, mode, content, last_edited_time).
+        """
+        return [article async for article in self.iter_ready_articles(database_id, include_body)]
+
+    async def iter_ready_articles(
+        self,
+        database_id: str,
+        include_body: bool | None = None,
+        edited_after: str | None = None,
+    ) -> AsyncIterator[Article]:
+        """
+        Yield Ready articles as each page of query results arrives.
+
+        The next page is requested in the background while the current one
+        is being consumed, and at most one page is held ahead of the
+        consumer, so processing starts on the first results and memory
+        stays bounded however long the Ready queue is. With include_body,
+        each article is yielded as soon as its own body has been fetched.
+
+        Args:
+            database_id: Notion database ID
+            include_body: Append each page's body text to its content
+                (default: the NOTION_FETCH_PAGE_BODY environment variable)
+            edited_after: Only pages edited on or after this ISO timestamp
+                (incremental mode; default: every Ready page)
+
+        Yields:
+            Article records (id, title, mode, content, last_edited_time).
+        """
+        if include_body is None:
+            include_body = env_flag("NOTION_FETCH_PAGE_BODY")
+
+        plan = await self.get_extraction_plan(database_id)
+        to_article = plan.to_article if plan else _page_to_article
+        filter_properties = plan.property_ids if plan else None
+
+        next_page = asyncio.ensure_future(
+            self.query_database(
+                database_id, filter_properties=filter_properties, edited_after=edited_after
+            )
+        )
+        try:
+            while next_page is not None:
+                data = await next_page
+                next_page = None
+                if data.get("has_more"):
+                    next_page = asyncio.ensure_future(self.query_database(
+                        database_id, data.get("next_cursor"), filter_properties, edited_after
+                    ))
+
+                articles = [to_article(page) for page in data.get("results", [])]
+                if not include_body:
+                    for article in articles:
+                        yield article
+                    continue
+
+                # Bodies are fetched concurrently and each article is handed
+                # on as soon as its own body is in (not in query order)
+                body_tasks = [
+                    asyncio.ensure_future(self._add_page_body(article)) for article in articles
+                ]
+                try:
+                    for finished in asyncio.as_completed(body_tasks):
+                        yield await finished
+                finally:
+                    for task in body_tasks:
+                        task.cancel()
+        finally:
+            if next_page is not None:
+                next_page.cancel()
+
+    async def _add_page_body(self, article: Article) -> Article:
+        """
+        Append a page's body to its content.
+
+        A page whose body cannot be fetched keeps its property content, so
+        one inaccessible page does not stop the others.
+        """
+        try:
+            body = await self.fetch_page_body(article.id)
+        except httpx.HTTPError as e:
+            print(
+                f"Warning: Could not fetch the body of page {article.id} ({e}), "
+                "using its properties only"
+            )
+            return article
+        article.content = "\n\n".join(
+            part for part in (article.content, body) if part.strip()
+        )
+        return article
+
+    async def fetch_page_body(self, page_id: str, max_depth: int | None = None) -> str:
+        """
+        Fetch a page's body blocks and flatten them into Markdown-ish text.
+
+        Args:
+            page_id: Notion page ID
+            max_depth: Nesting levels to follow
+                (default: NOTION_BLOCK_MAX_DEPTH, overridable via environment)
+
+        Returns:
+            The body text ("" for an empty page)
+        """
+        if max_depth is None:
+            max_depth = env_int("NOTION_BLOCK_MAX_DEPTH", NOTION_BLOCK_MAX_DEPTH)
+        blocks = await self.fetch_block_tree(page_id, max_depth)
+        return blocks_to_text(blocks)
+
+    async def fetch_block_tree(self, block_id: str, max_depth: int) -> list[dict]:
+        """
+        Fetch the children of a block, recursively, into block["children"].
+
+        Each child list is paginated sequentially (cursor-based), while
+        sibling subtrees are fetched concurrently; the scheduler keeps the
+        whole fan-out within the rate limit. Child pages and databases are
+        not followed.
+        """
+        blocks = []
+        start_cursor = None
+        while True:
+            params = {"page_size": 100}
+            if start_cursor:
+                params["start_cursor"] = start_cursor
+            data = await self._request("GET", f"/blocks/{block_id}/children", params=params)
+            blocks.extend(data.get("results", []))
+            if not data.get("has_more"):
+                break
+            start_cursor = data.get("next_cursor")
+
+        if max_depth > 1:
+            parents = [
+                block for block in blocks
+                if block.get("has_children") and block.get("type") not in SEPARATE_PAGE_TYPES
+            ]
+            subtrees = await asyncio.gather(
+                *(self.fetch_block_tree(block["id"], max_depth - 1) for block in parents)
+            )
+            for block, children in zip(parents, subtrees):
+                block["children"] = children
+        return blocks
+
+    async def mark_as_done(self, page_id: str) -> None:
+        """Update the Status property to 'Done' for the specified page."""
+        await self._request(
+            "PATCH", f"/pages/{page_id}",
+            priority=PRIORITY_HIGH,
+            json={"properties": DONE_PROPERTIES},
+        )
 
-        has_more = data.get("has_more", False)
-        start_cursor = data.get("next_cursor")
+    async def mark_many_as_done(self, page_ids: list[str]) -> list[Exception | None]:
+        """
+        Mark several pages as Done concurrently.
+
+        Returns:
+            One entry per page id: None on success, or the raised exception.
+        """
+        results = await asyncio.gather(
+            *(self.mark_as_done(page_id) for page_id in page_ids),
+            return_exceptions=True,
+        )
+        return [r if isinstance(r, Exception) else None for r in results]
 
-    return articles
+
+class NotionClient:
+    """
+    Synchronous facade over AsyncNotionClient for blocking callers.
+
+    Runs the async client on a private event loop in a background thread,
+    so the connection pool is shared by every call (from any thread).
+    """
+
+    def __init__(self, **client_kwargs):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="notion-client", daemon=True
+        )
+        self._thread.start()
+        try:
+            self._async_client = self._call(_create_async_client(**client_kwargs))
+        except Exception:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            raise
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def fetch_ready_articles(self, database_id: str, include_body: bool | None = None) -> list[Article]:
+        return self._call(self._async_client.fetch_ready_articles(database_id, include_body))
+
+    def iter_ready_articles(
+        self, database_id: str, include_body: bool | None = None
+    ) -> Iterator[Article]:
+        """Blocking iterator over AsyncNotionClient.iter_ready_articles."""
+        articles = self._async_client.iter_ready_articles(database_id, include_body)
+        try:
+            while True:
+                try:
+                    yield self._call(articles.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            self._call(articles.aclose())
+
+    def fetch_page_body(self, page_id: str, max_depth: int | None = None) -> str:
+        return self._call(self._async_client.fetch_page_body(page_id, max_depth))
+
+    def mark_as_done(self, page_id: str) -> None:
+        self._call(self._async_client.mark_as_done(page_id))
+
+    def mark_many_as_done(self, page_ids: list[str]) -> list[Exception | None]:
+        return self._call(self._async_client.mark_many_as_done(page_ids))
+
+    def close(self) -> None:
+        """Close the connection pool and stop the background loop."""
+        if self._loop.is_closed():
+            return
+        self._call(self._async_client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+async def _create_async_client(**client_kwargs) -> AsyncNotionClient:
+    # httpx.AsyncClient must be created on the loop that will use it
+    return AsyncNotionClient(**client_kwargs)
+
+
+_default_client: NotionClient | None = None
+_default_client_lock = threading.Lock()
+
+
+def _get_default_client() -> NotionClient:
+    """Return the process-wide sync client, creating it on first use."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = NotionClient()
+            atexit.register(_default_client.close)
+        return _default_client
+
+
+def fetch_ready_articles(database_id: str, include_body: bool | None = None) -> list[Article]:
+    """
+    Fetch articles with Status = 'Ready' from the Notion database.
+
+    Args:
+        database_id: Notion database ID
+        include_body: Append each page's body text to its content
+            (default: the NOTION_FETCH_PAGE_BODY environment variable)
+
+    Returns:
+        List of Article records (id, title, mode, content, last_edited_time).
+    """
+    return _get_default_client().fetch_ready_articles(database_id, include_body)
+
+
+def iter_ready_articles(database_id: str, include_body: bool | None = None) -> Iterator[Article]:
+    """
+    Iterate over articles with Status = 'Ready', one page of results at a time.
+
+    Yields:
+        Article records (id, title, mode, content, last_edited_time).
+    """
+    return _get_default_client().iter_ready_articles(database_id, include_body)
+
+
+def mark_as_done(page_id: str) -> None:
+    """Update the Status property to 'Done' for the specified page."""
+    _get_default_client().mark_as_done(page_id)
+
+
+def _page_to_article(page: dict) -> Article:
+    """
+    Build an Article from a Notion page object by probing candidate
+    properties (used when no ExtractionPlan is available).
+    """
+    return Article(
+        id=page["id"],
+        title=_extract_title(page),
+        mode=_extract_mode(page),
+        content=_extract_content(page),
+        last_edited_time=page.get("last_edited_time", ""),
+    )
 
 
 def _extract_title(page: dict) -> str:
@@ -142,27 +547,6 @@ def _extract_content(page: dict) -> str:
     return ""
 
 
-def mark_as_done(page_id: str) -> None:
-    """Update the Status property to 'Done' for the specified page."""
-    headers = get_notion_headers()
-    payload = {
-        "properties": {
-            "Status": {
-                "status": {
-                    "name": "Done"
-                }
-            }
-        }
-    }
-    response = httpx.patch(
-        f"{NOTION_API_BASE}/pages/{page_id}",
-        headers=headers,
-        json=payload,
-        timeout=30.0,
-    )
-    response.raise_for_status()
-
-
 if __name__ == "__main__":
     # Test execution
     from dotenv import load_dotenv
@@ -172,6 +556,6 @@ if __name__ == "__main__":
     articles = fetch_ready_articles(database_id)
     print(f"Found {len(articles)} ready articles:")
     for article in articles:
-        print(f"  - {article['title']}")
-        print(f"    Mode: {article['mode']}")
-        print(f"    Content: {article['content'][:100]}...")
+        print(f"  - {article.title}")
+        print(f"    Mode: {article.mode}")
+        print(f"    Content: {article.content[:100]}...")
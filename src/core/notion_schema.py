@@ -0,0 +1,167 @@
+"""
+Schema-compiled property extraction for Notion pages.
+
+The database schema (GET /databases/{id}) is read once and compiled into an
+ExtractionPlan: the exact property names and types to read for the title,
+mode and content. Pages are then decoded without probing candidate names
+and types, and the plan's property IDs are passed as filter_properties so
+Notion only returns the properties we read.
+"""
+
+import os
+import sys
+from typing import Callable
+from urllib.parse import unquote
+
+# Add parent directory to path for config import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import DEFAULT_MODE
+from core.article import Article
+
+# Candidate (property name, property type) pairs, in order of preference
+TITLE_CANDIDATES = [
+    ("ID", "unique_id"),
+    ("ID", "number"),
+    ("タイトル", "title"),
+    ("Title", "title"),
+    ("name", "title"),
+]
+MODE_CANDIDATES = [
+    ("モード", "select"),
+    ("モード", "multi_select"),
+]
+CONTENT_CANDIDATES = [
+    ("文章のネタ", "rich_text"),
+    ("テキスト", "rich_text"),
+    ("Content", "rich_text"),
+    ("content", "rich_text"),
+]
+
+# Reads one property value; None means "empty, try the next property"
+Getter = Callable[[dict], str | None]
+
+
+def _unique_id(prop: dict) -> str | None:
+    number = (prop.get("unique_id") or {}).get("number")
+    return str(number) if number is not None else None
+
+
+def _number(prop: dict) -> str | None:
+    number = prop.get("number")
+    return str(number) if number is not None else None
+
+
+def _title(prop: dict) -> str | None:
+    title_list = prop.get("title")
+    return title_list[0].get("plain_text", "") if title_list else None
+
+
+def _select(prop: dict) -> str | None:
+    select_obj = prop.get("select")
+    return select_obj.get("name", DEFAULT_MODE) if select_obj else None
+
+
+def _multi_select(prop: dict) -> str | None:
+    multi_select = prop.get("multi_select")
+    return multi_select[0].get("name", DEFAULT_MODE) if multi_select else None
+
+
+def _rich_text(prop: dict) -> str | None:
+    rich_text_list = prop.get("rich_text")
+    if not rich_text_list:
+        return None
+    return "".join(rt.get("plain_text", "") for rt in rich_text_list)
+
+
+GETTERS: dict[str, Getter] = {
+    "unique_id": _unique_id,
+    "number": _number,
+    "title": _title,
+    "select": _select,
+    "multi_select": _multi_select,
+    "rich_text": _rich_text,
+}
+
+
+class ExtractionPlan:
+    """Fixed property readers for the pages of one database."""
+
+    def __init__(
+        self,
+        title: list[tuple[str, Getter]],
+        mode: list[tuple[str, Getter]],
+        content: list[tuple[str, Getter]],
+        property_ids: list[str],
+    ):
+        """
+        Args:
+            title / mode / content: (property name, getter) pairs present in
+                the schema, in order of preference
+            property_ids: Decoded IDs of those properties (filter_properties)
+        """
+        self.title = title
+        self.mode = mode
+        self.content = content
+        self.property_ids = property_ids
+
+    def to_article(self, page: dict) -> Article:
+        """Build an Article from a Notion page object."""
+        properties = page.get("properties", {})
+        return Article(
+            id=page["id"],
+            title=_first_value(properties, self.title, ""),
+            mode=_first_value(properties, self.mode, DEFAULT_MODE),
+            content=_first_value(properties, self.content, ""),
+            last_edited_time=page.get("last_edited_time", ""),
+        )
+
+
+def _first_value(properties: dict, readers: list[tuple[str, Getter]], default: str) -> str:
+    for name, getter in readers:
+        prop = properties.get(name)
+        if prop:
+            value = getter(prop)
+            if value is not None:
+                return value
+    return default
+
+
+def compile_extraction_plan(database: dict) -> ExtractionPlan:
+    """
+    Compile a database object (GET /databases/{id}) into an ExtractionPlan.
+
+    Only candidate properties that exist in the schema with the expected
+    type are kept.
+    """
+    schema = database.get("properties", {})
+    property_ids: list[str] = []
+
+    def readers(candidates: list[tuple[str, str]]) -> list[tuple[str, Getter]]:
+        found = []
+        for name, prop_type in candidates:
+            prop = schema.get(name)
+            if prop and prop.get("type") == prop_type:
+                found.append((name, GETTERS[prop_type]))
+                # Schema IDs are percent-encoded; the HTTP client re-encodes them
+                prop_id = unquote(prop.get("id", ""))
+                if prop_id and prop_id not in property_ids:
+                    property_ids.append(prop_id)
+        return found
+
+    plan = ExtractionPlan(
+        title=readers(TITLE_CANDIDATES),
+        mode=readers(MODE_CANDIDATES),
+        content=readers(CONTENT_CANDIDATES),
+        property_ids=property_ids,
+    )
+
+    def describe(found: list[tuple[str, Getter]]) -> str:
+        return ", ".join(f"{name} ({getter.__name__.lstrip('_')})" for name, getter in found) or "-"
+
+    print(
+        f"✓ Extraction plan: title={describe(plan.title)}; "
+        f"mode={describe(plan.mode)}; content={describe(plan.content)}"
+    )
+    if not plan.content:
+        print("⚠ No content property (文章のネタ / テキスト / Content) found in the database")
+    return plan
@@ -2,69 +2,88 @@
 OpenAI API client for formatting articles with mode-specific prompts.
 """
 
+import asyncio
 import os
 import sys
-from openai import OpenAI
+import time
+from typing import AsyncIterator, Hashable, Iterable
+from openai import AsyncOpenAI, OpenAI
 
 # Add parent directory to path for prompts import
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from prompts import NOTE_MARKDOWN_RULES, MODE_PROMPTS, EMPATHY_ESSAY_PROMPT
+from prompts import (
+    NOTE_MARKDOWN_RULES,
+    MODE_PROMPTS,
+    MODE_INPUT_LABELS,
+    EMPATHY_ESSAY_PROMPT,
+    EMPATHY_ESSAY_INPUT_LABEL,
+)
+from core.format_cache import FormatCache, get_format_cache
 
 
-def format_article(content: str, mode: str) -> tuple[str, str]:
-    """
-    Format content into a structured article using OpenAI API.
+USER_MESSAGE = """タイトルは1行目に見出し記号なしで出力してください。
+マークダウン形式で出力してください（```markdown などのコードブロックで囲まないでください）。
+"""
 
-    Args:
-        content: Raw content (文章のネタ) from Notion
-        mode: Article mode (共感・エッセイ型, ノウハウ・ビジネス型, 推敲・リライト型)
+MAX_OUTPUT_TOKENS = 4096
 
-    Returns:
-        Tuple of (title, formatted_body)
-    """
+
+def _get_api_key() -> str:
     api_key = os.environ.get("OPENAI_API_KEY")
     if not api_key:
         raise ValueError("OPENAI_API_KEY environment variable is not set")
+    return api_key
+
 
+def _get_model() -> str:
     # Get model from environment variable, default to gpt-4o-mini
-    model = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+    return os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
 
+
+def _build_messages(content: str, mode: str) -> list[dict]:
+    """
+    Build the chat messages for a mode-specific formatting request.
+
+    The system prompt (markdown rules + mode instructions) is identical for
+    every article of a mode, so OpenAI can serve it from its prompt cache;
+    the article content goes last, at the end of the user message.
+    """
     # Get mode-specific prompt, fallback to empathy/essay if mode not found
     mode_prompt = MODE_PROMPTS.get(mode, EMPATHY_ESSAY_PROMPT)
-
-    # Format the mode prompt with actual content (replace {content} placeholder)
-    mode_prompt = mode_prompt.format(content=content)
+    input_label = MODE_INPUT_LABELS.get(mode, EMPATHY_ESSAY_INPUT_LABEL)
 
     # Combine base markdown rules with mode-specific prompt
     system_prompt = NOTE_MARKDOWN_RULES + "\n\n" + mode_prompt
 
-    client = OpenAI(api_key=api_key)
+    user_message = USER_MESSAGE + "\n" + input_label + ":\n" + content
 
-    user_message = """タイトルは1行目に見出し記号なしで出力してください。
-マークダウン形式で出力してください（```markdown などのコードブロックで囲まないでください）。
-"""
+    return [
+        {
+            "role": "system",
+            "content": system_prompt
+        },
+        {
+            "role": "user",
+            "content": user_message
+        }
+    ]
 
-    print(f"Using mode: {mode}")
-    print(f"Using model: {model}")
 
-    message = client.chat.completions.create(
-        model=model,
-        max_tokens=4096,
-        messages=[
-            {
-                "role": "system",
-                "content": system_prompt
-            },
-            {
-                "role": "user",
-                "content": user_message
-            }
-        ]
+def _log_usage(message) -> None:
+    """Log token usage, including prompt tokens served from OpenAI's cache."""
+    usage = message.usage
+    if not usage:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", None) or 0
+    print(
+        f"Tokens: prompt {usage.prompt_tokens} (cached {cached_tokens}), "
+        f"completion {usage.completion_tokens}"
     )
 
-    formatted_content = message.choices[0].message.content
 
-    # Extract title and body
+def _parse_formatted(formatted_content: str) -> tuple[str, str]:
+    """Split the model output into (title, body)."""
     lines = formatted_content.strip().split("\n")
 
     # First non-empty line is the title
@@ -88,6 +107,344 @@ def format_article(content: str, mode: str) -> tuple[str, str]:
     return title, body
 
 
+def format_article(content: str, mode: str) -> tuple[str, str]:
+    """
+    Format content into a structured article using OpenAI API.
+
+    Args:
+        content: Raw content (文章のネタ) from Notion
+        mode: Article mode (共感・エッセイ型, ノウハウ・ビジネス型, 推敲・リライト型)
+
+    Returns:
+        Tuple of (title, formatted_body)
+    """
+    model = _get_model()
+    messages = _build_messages(content, mode)
+
+    cache = get_format_cache()
+    cache_key = FormatCache.make_key(content, mode, model, messages)
+    cached = cache.get(cache_key) if cache else None
+    if cached:
+        print("✓ Using cached formatting result")
+        return cached
+
+    client = OpenAI(api_key=_get_api_key())
+
+    print(f"Using mode: {mode}")
+    print(f"Using model: {model}")
+
+    message = client.chat.completions.create(
+        model=model,
+        max_tokens=MAX_OUTPUT_TOKENS,
+        messages=messages,
+    )
+    _log_usage(message)
+
+    title, body = _parse_formatted(message.choices[0].message.content)
+    if cache:
+        cache.put(cache_key, title, body)
+    return title, body
+
+
+class _TokenBudget:
+    """Tokens-per-minute budget: a token bucket refilled continuously."""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = tokens_per_minute
+        self._available = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._available = min(
+            self.capacity,
+            self._available + (now - self._updated) * self.capacity / 60,
+        )
+        self._updated = now
+
+    async def acquire(self, tokens: int) -> None:
+        """Wait until `tokens` can be spent (requests are served in order)."""
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self._available < tokens:
+                await asyncio.sleep((tokens - self._available) * 60 / self.capacity)
+                self._refill()
+            self._available -= tokens
+
+    def refund(self, tokens: int) -> None:
+        """Return over-estimated tokens once actual usage is known."""
+        self._refill()
+        self._available = min(self.capacity, self._available + tokens)
+
+
+class StreamedArticle:
+    """
+    A formatting result that is still being generated.
+
+    The title resolves as soon as the first non-empty line has streamed in,
+    so callers can start work that only needs the title (e.g. rendering the
+    header image) while the body is still being generated.
+
+    Usage:
+        article = formatter.stream(content, mode)
+        title = await article.title()
+        async for chunk in article.body_chunks():
+            ...
+        title, body = await article.result()
+    """
+
+    def __init__(self):
+        loop = asyncio.get_running_loop()
+        self._title: asyncio.Future = loop.create_future()
+        self._result: asyncio.Future = loop.create_future()
+        self._chunks: asyncio.Queue = asyncio.Queue()
+        self._text = ""
+        self._task: asyncio.Task | None = None
+
+    async def title(self) -> str:
+        """Wait for the title (first non-empty line, heading marks removed)."""
+        return await asyncio.shield(self._title)
+
+    async def body_chunks(self) -> AsyncIterator[str]:
+        """Iterate over the raw body text as it is generated (single consumer)."""
+        while True:
+            chunk = await self._chunks.get()
+            if chunk is None:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+    async def result(self) -> tuple[str, str]:
+        """Wait for the complete (title, body), parsed like format_article."""
+        return await asyncio.shield(self._result)
+
+    def cancel(self) -> None:
+        """Stop generating (e.g. when the article failed elsewhere)."""
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+    def _feed(self, delta: str) -> None:
+        if self._title.done():
+            self._chunks.put_nowait(delta)
+            return
+
+        self._text += delta
+        # Only complete lines can hold the title
+        complete, newline, rest = self._text.rpartition("\n")
+        if not newline:
+            return
+        lines = complete.split("\n")
+        for i, line in enumerate(lines):
+            stripped = line.strip()
+            if stripped:
+                title = stripped.lstrip("#").strip()
+                if not title:
+                    # Heading marks only; the final parse decides the title
+                    return
+                self._title.set_result(title)
+                remainder = "\n".join(lines[i + 1:]) + newline + rest
+                if remainder:
+                    self._chunks.put_nowait(remainder)
+                return
+
+    def _finish(self, text: str) -> None:
+        title, body = _parse_formatted(text)
+        if not self._title.done():
+            self._title.set_result(title)
+            self._chunks.put_nowait(body)
+        self._chunks.put_nowait(None)
+        self._result.set_result((title, body))
+
+    def _fail(self, error: BaseException) -> None:
+        if isinstance(error, asyncio.CancelledError):
+            error = RuntimeError("Formatting was cancelled")
+        for future in (self._title, self._result):
+            if not future.done():
+                future.set_exception(error)
+                # Mark as retrieved; awaiting callers still get the error
+                future.exception()
+        self._chunks.put_nowait(error)
+
+
+class AsyncArticleFormatter:
+    """
+    Concurrent article formatter sharing one AsyncOpenAI client.
+
+    Requests run under a concurrency limit and an optional tokens-per-minute
+    budget (estimated up front from the prompt length plus max_tokens, then
+    corrected from the reported usage).
+
+    Usage:
+        async with AsyncArticleFormatter(max_concurrency=4) as formatter:
+            title, body = await formatter.format(content, mode)
+            async for key, result in formatter.format_many(items):
+                ...
+            streamed = formatter.stream(content, mode)
+    """
+
+    def __init__(self, max_concurrency: int = 4, tokens_per_minute: int = 0):
+        """
+        Args:
+            max_concurrency: Maximum number of in-flight requests
+            tokens_per_minute: Token budget per minute (0 = unlimited)
+        """
+        self._client = AsyncOpenAI(api_key=_get_api_key())
+        self._model = _get_model()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._budget = _TokenBudget(tokens_per_minute) if tokens_per_minute > 0 else None
+
+    async def __aenter__(self) -> "AsyncArticleFormatter":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close the underlying HTTP client."""
+        await self._client.close()
+
+    async def format(self, content: str, mode: str) -> tuple[str, str]:
+        """
+        Format content into a structured article.
+
+        Args:
+            content: Raw content (文章のネタ) from Notion
+            mode: Article mode (共感・エッセイ型, ノウハウ・ビジネス型, 推敲・リライト型)
+
+        Returns:
+            Tuple of (title, formatted_body)
+        """
+        messages = _build_messages(content, mode)
+
+        cache = get_format_cache()
+        cache_key = FormatCache.make_key(content, mode, self._model, messages)
+        cached = cache.get(cache_key) if cache else None
+        if cached:
+            print("✓ Using cached formatting result")
+            return cached
+
+        # Rough upper bound: ~1 token per character for Japanese text
+        estimate = sum(len(m["content"]) for m in messages) + MAX_OUTPUT_TOKENS
+
+        async with self._semaphore:
+            if self._budget:
+                await self._budget.acquire(estimate)
+
+            print(f"Using mode: {mode}")
+            print(f"Using model: {self._model}")
+
+            message = await self._client.chat.completions.create(
+                model=self._model,
+                max_tokens=MAX_OUTPUT_TOKENS,
+                messages=messages,
+            )
+        _log_usage(message)
+
+        if self._budget and message.usage:
+            self._budget.refund(max(0, estimate - message.usage.total_tokens))
+
+        title, body = _parse_formatted(message.choices[0].message.content)
+        if cache:
+            cache.put(cache_key, title, body)
+        return title, body
+
+    def stream(self, content: str, mode: str) -> StreamedArticle:
+        """
+        Start formatting with a streamed response.
+
+        Args:
+            content: Raw content (文章のネタ) from Notion
+            mode: Article mode (共感・エッセイ型, ノウハウ・ビジネス型, 推敲・リライト型)
+
+        Returns:
+            StreamedArticle whose title resolves before the body is complete
+        """
+        article = StreamedArticle()
+        article._task = asyncio.create_task(self._run_stream(content, mode, article))
+        return article
+
+    async def _run_stream(self, content: str, mode: str, article: StreamedArticle) -> None:
+        try:
+            messages = _build_messages(content, mode)
+
+            cache = get_format_cache()
+            cache_key = FormatCache.make_key(content, mode, self._model, messages)
+            cached = cache.get(cache_key) if cache else None
+            if cached:
+                print("✓ Using cached formatting result")
+                article._finish(cached[0] + "\n\n" + cached[1])
+                return
+
+            estimate = sum(len(m["content"]) for m in messages) + MAX_OUTPUT_TOKENS
+            usage_chunk = None
+            parts = []
+
+            async with self._semaphore:
+                if self._budget:
+                    await self._budget.acquire(estimate)
+
+                print(f"Using mode: {mode} (streaming)")
+                print(f"Using model: {self._model}")
+
+                stream = await self._client.chat.completions.create(
+                    model=self._model,
+                    max_tokens=MAX_OUTPUT_TOKENS,
+                    messages=messages,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                )
+                async for chunk in stream:
+                    if chunk.choices:
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            parts.append(delta)
+                            article._feed(delta)
+                    if chunk.usage:
+                        usage_chunk = chunk
+
+            if usage_chunk:
+                _log_usage(usage_chunk)
+                if self._budget:
+                    self._budget.refund(max(0, estimate - usage_chunk.usage.total_tokens))
+
+            article._finish("".join(parts))
+            if cache:
+                cache.put(cache_key, *(await article.result()))
+        except BaseException as e:
+            article._fail(e)
+            if not isinstance(e, Exception):
+                raise
+
+    async def format_many(
+        self, items: Iterable[tuple[Hashable, str, str]]
+    ) -> AsyncIterator[tuple[Hashable, tuple[str, str] | Exception]]:
+        """
+        Format many articles concurrently, yielding results as they complete.
+
+        Args:
+            items: (key, content, mode) tuples; key identifies the article
+
+        Yields:
+            (key, (title, body)) on success, or (key, exception) on failure
+        """
+        async def run(key, content, mode):
+            try:
+                return key, await self.format(content, mode)
+            except Exception as e:
+                return key, e
+
+        tasks = [asyncio.create_task(run(*item)) for item in items]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
 if __name__ == "__main__":
     # Test execution
     from dotenv import load_dotenv
@@ -0,0 +1,191 @@
+"""
+Staged article pipeline: fetch -> format -> render -> post -> mark-done.
+
+Each stage runs its own pool of workers and hands articles to the next
+stage through a bounded queue, so formatting and header rendering for the
+next articles overlap with the (slow, single-browser) posting stage.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterable, Callable, Iterable
+
+from core.article import Article
+
+# Sentinel telling a stage worker to shut down
+_STOP = object()
+
+
+class WorkItem:
+    """An article travelling through the pipeline, plus per-stage results."""
+
+    def __init__(self, index: int, article: Article):
+        self.index = index
+        self.article = article
+        self.title = ""
+        self.body = ""
+        self.header_image: bytes | None = None
+        self.header_image_mime_type = "image/png"
+        self.header_image_extension = ".png"
+        # Set when the body is still streaming in after the title is known;
+        # resolves to the body and is awaited before the post stage runs
+        self.body_task: asyncio.Future | None = None
+        # Set when a stage failed; the item then leaves the pipeline
+        self.error: Exception | None = None
+
+    async def wait_for_body(self) -> None:
+        """Fill item.body from a still-running body_task, if any."""
+        if self.body_task is not None:
+            self.body = await self.body_task
+            self.body_task = None
+
+    def discard_body_task(self) -> None:
+        """Stop generating the body of an article that left the pipeline early."""
+        if self.body_task is not None and not self.body_task.done():
+            self.body_task.cancel()
+
+    @property
+    def label(self) -> str:
+        return f"#{self.index} (ID: {self.article.title})"
+
+
+async def run_pipeline(
+    articles: Iterable[Article] | AsyncIterable[Article],
+    format_stage: Callable[[WorkItem], Any],
+    render_stage: Callable[[WorkItem], Any],
+    post_stage: Callable[[WorkItem], Any],
+    done_stage: Callable[[WorkItem], Any],
+    cleanup: Callable[[WorkItem], Any] | None = None,
+    post_stage_teardown: Callable[[], Any] | None = None,
+    format_workers: int = 4,
+    render_workers: int = 2,
+    done_workers: int = 4,
+    queue_size: int = 4,
+) -> tuple[int, int]:
+    """
+    Run articles through the staged pipeline.
+
+    Stage callables receive a WorkItem and fill in its fields. Blocking
+    functions are executed in thread pools; coroutine functions are awaited
+    directly on the event loop. The post stage always runs on a single
+    dedicated thread because Playwright's sync API is bound to the thread
+    that started it.
+
+    Args:
+        articles: Articles as returned by fetch_ready_articles, or an async
+            iterator such as iter_ready_articles (consumed as the format
+            queue drains; a fetch error stops intake but lets articles
+            already in flight finish)
+        format_stage: Fills item.title / item.body (OpenAI)
+        render_stage: Fills item.header_image (Pillow)
+        post_stage: Posts the draft to note.com
+        done_stage: Marks the Notion page as Done
+        cleanup: Called once per item after it leaves the pipeline, with
+            item.error set if a stage failed (optional)
+        post_stage_teardown: Called on the post thread once the post stage
+            has drained, e.g. to close a shared browser session (optional)
+        format_workers: Number of concurrent format workers
+        render_workers: Number of concurrent render workers
+        done_workers: Number of concurrent mark-done workers
+        queue_size: Capacity of each queue between stages
+
+    Returns:
+        Tuple of (success_count, error_count)
+    """
+    counts = {"success": 0, "error": 0}
+
+    format_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    render_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    post_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    done_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    format_executor = ThreadPoolExecutor(max_workers=format_workers, thread_name_prefix="format")
+    render_executor = ThreadPoolExecutor(max_workers=render_workers, thread_name_prefix="render")
+    post_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="post")
+    done_executor = ThreadPoolExecutor(max_workers=done_workers, thread_name_prefix="done")
+
+    def finish(item: WorkItem) -> None:
+        item.discard_body_task()
+        if cleanup:
+            try:
+                cleanup(item)
+            except Exception as e:
+                print(f"Warning: cleanup failed for article {item.label}: {e}")
+
+    # (name, handler, executor, workers, inbox, outbox, downstream workers)
+    stages = [
+        ("Format", format_stage, format_executor, format_workers, format_queue, render_queue, render_workers),
+        ("Render", render_stage, render_executor, render_workers, render_queue, post_queue, 1),
+        ("Post", post_stage, post_executor, 1, post_queue, done_queue, done_workers),
+        ("Mark-done", done_stage, done_executor, done_workers, done_queue, None, 0),
+    ]
+
+    async def worker(name, handler, executor, inbox, outbox) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await inbox.get()
+            if item is _STOP:
+                return
+            try:
+                if executor is post_executor:
+                    # Posting needs the complete body
+                    await item.wait_for_body()
+                if asyncio.iscoroutinefunction(handler):
+                    await handler(item)
+                else:
+                    await loop.run_in_executor(executor, handler, item)
+            except Exception as e:
+                print(f"\n[{name}] Error processing article {item.label}: {e}")
+                item.error = e
+                counts["error"] += 1
+                finish(item)
+                continue
+
+            if outbox is None:
+                print(f"✓ Article {item.label} completed")
+                counts["success"] += 1
+                finish(item)
+            else:
+                await outbox.put(item)
+
+    async def run_stage(name, handler, executor, workers, inbox, outbox, next_workers) -> None:
+        tasks = [
+            asyncio.create_task(worker(name, handler, executor, inbox, outbox))
+            for _ in range(workers)
+        ]
+        await asyncio.gather(*tasks)
+        if executor is post_executor and post_stage_teardown:
+            try:
+                await asyncio.get_running_loop().run_in_executor(executor, post_stage_teardown)
+            except Exception as e:
+                print(f"Warning: post stage teardown failed: {e}")
+        # Upstream is drained: tell the next stage to stop once it is, too
+        if outbox is not None:
+            for _ in range(next_workers):
+                await outbox.put(_STOP)
+
+    async def produce() -> None:
+        try:
+            if isinstance(articles, AsyncIterable):
+                i = 0
+                async for article in articles:
+                    i += 1
+                    await format_queue.put(WorkItem(i, article))
+            else:
+                for i, article in enumerate(articles, 1):
+                    await format_queue.put(WorkItem(i, article))
+        except Exception as e:
+            print(f"\n[Fetch] Error fetching articles: {e}")
+            counts["error"] += 1
+        finally:
+            # Always release the workers, even if fetching failed midway
+            for _ in range(format_workers):
+                await format_queue.put(_STOP)
+
+    try:
+        await asyncio.gather(produce(), *(run_stage(*stage) for stage in stages))
+    finally:
+        for _, _, executor, *_ in stages:
+            executor.shutdown(wait=True)
+
+    return counts["success"], counts["error"]
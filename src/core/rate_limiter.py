@@ -0,0 +1,148 @@
+"""
+Rate-limit aware request scheduler for the Notion API.
+
+Notion allows about 3 requests per second per integration and answers
+bursts with 429 + Retry-After. The scheduler hands out request slots from a
+token bucket (higher-priority requests first), and retries 429 / 5xx /
+network errors with jittered exponential backoff, honouring Retry-After.
+"""
+
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable
+
+import httpx
+
+# Lower value = served first
+PRIORITY_HIGH = 0    # Status updates (finishing work already done)
+PRIORITY_NORMAL = 1  # Queries and reads
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class NotionRequestScheduler:
+    """
+    Token bucket + retry policy shared by every request of a Notion client.
+
+    A scheduler is bound to the event loop it is first used on.
+    """
+
+    def __init__(
+        self,
+        rate: float = 3.0,
+        burst: int = 3,
+        max_retries: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+    ):
+        """
+        Args:
+            rate: Sustained requests per second
+            burst: Bucket capacity (requests allowed back-to-back)
+            max_retries: Retries per request before giving up
+            base_delay: Initial backoff delay in seconds
+            max_delay: Upper bound for a single backoff delay in seconds
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._dispatcher: asyncio.Task | None = None
+
+    async def acquire(self, priority: int = PRIORITY_NORMAL) -> None:
+        """Wait for a request slot."""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out slots for `seconds` (e.g. after a 429)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def _dispatch(self) -> None:
+        """Release waiters in priority order as tokens become available."""
+        while self._waiters:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            wait = self._paused_until - now
+            if wait <= 0:
+                if self._tokens >= 1:
+                    _, _, future = heapq.heappop(self._waiters)
+                    if not future.done():
+                        self._tokens -= 1
+                        future.set_result(None)
+                    continue
+                wait = (1 - self._tokens) / self.rate
+            await asyncio.sleep(wait)
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def send(
+        self,
+        request: Callable[[], Awaitable[httpx.Response]],
+        priority: int = PRIORITY_NORMAL,
+    ) -> httpx.Response:
+        """
+        Send a request under the rate limit, retrying transient failures.
+
+        Args:
+            request: Zero-argument coroutine function performing the request
+            priority: PRIORITY_HIGH or PRIORITY_NORMAL
+
+        Returns:
+            The final response (possibly still an error once retries run out)
+        """
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(priority)
+            try:
+                response = await request()
+            except httpx.TransportError as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                print(f"Notion request failed ({e!r}), retrying in {delay:.1f}s")
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt == self.max_retries:
+                    return response
+
+                retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+                delay = retry_after if retry_after is not None else self._backoff(attempt)
+                if response.status_code == 429:
+                    # Rate limited: hold back every request, not just this one
+                    self.pause(delay)
+                print(f"Notion returned {response.status_code}, retrying in {delay:.1f}s")
+
+            await asyncio.sleep(delay)
+
+        raise AssertionError("unreachable")
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    """Parse a Retry-After header (seconds or HTTP date) into seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
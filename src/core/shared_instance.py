@@ -0,0 +1,62 @@
+"""
+Lazily created process-wide instances of the local caches and stores.
+"""
+
+import os
+import sys
+import threading
+from typing import Callable, Generic, TypeVar
+
+# Add parent directory to path for config import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import env_flag
+
+T = TypeVar("T")
+
+
+class SharedInstance(Generic[T]):
+    """One instance per process, opened on first use at a configurable path."""
+
+    def __init__(
+        self,
+        description: str,
+        disable_env: str,
+        path_env: str,
+        default_path: str,
+        factory: Callable[[str], T],
+        errors: type[Exception] | tuple[type[Exception], ...],
+    ):
+        """
+        Args:
+            description: Name used in the warning when opening fails
+            disable_env: Environment flag that turns the instance off
+            path_env: Environment variable overriding default_path
+            default_path: File or directory the instance is opened at
+            factory: Opens the instance at a path
+            errors: Exceptions meaning "unavailable" rather than a bug
+        """
+        self.description = description
+        self.disable_env = disable_env
+        self.path_env = path_env
+        self.default_path = default_path
+        self.factory = factory
+        self.errors = errors
+        self._instance: T | None = None
+        self._lock = threading.Lock()
+
+    def get(self) -> T | None:
+        """
+        Return the instance, or None if disable_env is set or it cannot be
+        opened (opening is retried on the next call).
+        """
+        if env_flag(self.disable_env):
+            return None
+        with self._lock:
+            if self._instance is None:
+                path = os.environ.get(self.path_env, self.default_path)
+                try:
+                    self._instance = self.factory(path)
+                except self.errors as e:
+                    print(f"Warning: {self.description} unavailable ({path}): {e}")
+                    return None
+            return self._instance
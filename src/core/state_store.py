@@ -0,0 +1,170 @@
+"""
+Local record of what happened to each Notion page in earlier runs.
+
+For every processed page the store keeps the page's last_edited_time, the
+outcome of the last attempt and how many attempts that version has had, so
+a page that failed and was not edited since is retried only up to a limit.
+It also keeps a per-database checkpoint for the incremental query mode
+(only pages edited on or after the checkpoint are queried).
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+# Add parent directory to path for config import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import PAGE_STATE_PATH, PAGE_MAX_ATTEMPTS, env_int
+from core.shared_instance import SharedInstance
+
+OUTCOME_DONE = "done"
+OUTCOME_FAILED = "failed"
+
+# Notion rounds last_edited_time to the minute: keep a margin below the
+# checkpoint so edits made while a run was querying are not missed
+CHECKPOINT_MARGIN = timedelta(minutes=2)
+
+
+class PageStateStore:
+    """SQLite-backed page outcomes and query checkpoints, shared between threads."""
+
+    def __init__(self, path: str, max_attempts: int = 3):
+        """
+        Args:
+            path: SQLite database file (parent directories are created)
+            max_attempts: Attempts allowed per unchanged version of a page
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS pages (
+                page_id TEXT PRIMARY KEY,
+                last_edited_time TEXT NOT NULL,
+                outcome TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS checkpoints (
+                database_id TEXT PRIMARY KEY,
+                edited_after TEXT NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def should_process(self, page_id: str, last_edited_time: str) -> bool:
+        """
+        False for a page whose current version already failed max_attempts
+        times. Edited pages (new last_edited_time) always get a fresh try,
+        and so does every page while the store cannot be read.
+        """
+        row = self._get_page(page_id)
+        if row is None or not last_edited_time or row[0] != last_edited_time:
+            return True
+        return row[1] != OUTCOME_FAILED or row[2] < self.max_attempts
+
+    def retries_left(self, page_id: str, last_edited_time: str) -> bool:
+        """True if the page's current version failed but may be retried."""
+        row = self._get_page(page_id)
+        return (
+            row is not None
+            and row[0] == last_edited_time
+            and row[1] == OUTCOME_FAILED
+            and row[2] < self.max_attempts
+        )
+
+    def record(self, page_id: str, last_edited_time: str, outcome: str) -> bool:
+        """
+        Store the outcome of an attempt (attempts restart for a new version).
+
+        Returns:
+            False if the outcome could not be stored (a warning is logged)
+        """
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT last_edited_time, attempts FROM pages WHERE page_id = ?", (page_id,)
+                ).fetchone()
+                attempts = row[1] + 1 if row and row[0] == last_edited_time else 1
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO pages "
+                    "(page_id, last_edited_time, outcome, attempts, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (page_id, last_edited_time, outcome, attempts, time.time()),
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"Warning: Could not record the outcome of page {page_id}: {e}")
+            return False
+        return True
+
+    def _get_page(self, page_id: str) -> tuple | None:
+        """(last_edited_time, outcome, attempts) of a page, None if unknown or unreadable."""
+        try:
+            with self._lock:
+                return self._conn.execute(
+                    "SELECT last_edited_time, outcome, attempts FROM pages WHERE page_id = ?",
+                    (page_id,),
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Warning: Could not read the state of page {page_id}: {e}")
+            return None
+
+    def get_checkpoint(self, database_id: str) -> str | None:
+        """ISO timestamp to query from, or None for a full query (also on a database error)."""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT edited_after FROM checkpoints WHERE database_id = ?", (database_id,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Warning: Could not read the query checkpoint: {e}")
+            return None
+        return row[0] if row else None
+
+    def set_checkpoint(self, database_id: str, edited_after: datetime) -> None:
+        """Store the checkpoint (CHECKPOINT_MARGIN earlier than edited_after)."""
+        value = (edited_after - CHECKPOINT_MARGIN).astimezone(timezone.utc)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (database_id, edited_after) VALUES (?, ?)",
+                (database_id, value.isoformat(timespec="seconds").replace("+00:00", "Z")),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def parse_notion_time(value: str) -> datetime:
+    """Parse a Notion timestamp such as 2024-05-01T12:34:00.000Z."""
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+_default_store = SharedInstance(
+    "Page state store",
+    disable_env="PAGE_STATE_DISABLE",
+    path_env="PAGE_STATE_PATH",
+    default_path=PAGE_STATE_PATH,
+    factory=lambda path: PageStateStore(
+        path, max_attempts=env_int("PAGE_MAX_ATTEMPTS", PAGE_MAX_ATTEMPTS)
+    ),
+    errors=(sqlite3.Error, OSError),
+)
+
+
+def get_page_state_store() -> PageStateStore | None:
+    """Return the process-wide store (None if disabled or unavailable)."""
+    return _default_store.get()
@@ -7,117 +7,302 @@ This script:
 3. Generates header image with article title
 4. Posts articles as drafts to note.com
 5. Updates Notion status to 'Done'
+
+Steps 2-5 run as a staged pipeline (see core/pipeline.py), so several
+articles are in flight at once.
 """
 
+import asyncio
 import os
 import sys
-import tempfile
-import shutil
+from datetime import datetime, timezone
 
 # Add the src directory to the path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from dotenv import load_dotenv
 
+from config import (
+    PIPELINE_FORMAT_WORKERS,
+    PIPELINE_RENDER_WORKERS,
+    PIPELINE_DONE_WORKERS,
+    PIPELINE_QUEUE_SIZE,
+    OPENAI_TOKENS_PER_MINUTE,
+    OPENAI_BATCH_POLL_INTERVAL,
+    OPENAI_BATCH_TIMEOUT,
+    OPENAI_BATCH_CANCEL_TIMEOUT,
+    env_flag,
+    env_int,
+)
+
 # Import from core modules
-from core.notion_client import fetch_ready_articles, mark_as_done
-from core.openai_formatter import format_article
-from core.note_poster import post_draft_to_note
-from core.image_generator import create_header_image
+from core.notion_client import AsyncNotionClient
+from core.openai_formatter import AsyncArticleFormatter, StreamedArticle
+from core.batch_formatter import format_articles_batch
+from core.note_poster import NotePosterSession
+from core.image_generator import (
+    create_render_pool,
+    get_cached_header,
+    get_header_encoding,
+    render_header_bytes,
+)
+from core.pipeline import WorkItem, run_pipeline
+from core.state_store import (
+    OUTCOME_DONE,
+    OUTCOME_FAILED,
+    get_page_state_store,
+    parse_notion_time,
+)
 
 # Load environment variables from .env file
 load_dotenv()
 
 
-def main() -> int:
-    """Main entry point."""
-    print("=" * 50)
-    print("Notion-to-Note Article AutoDrafter")
-    print("=" * 50)
+# Shared browser session for the whole run; opened lazily on the post thread
+_poster_session = NotePosterSession()
 
-    # Validate environment variables
-    required_vars = [
-        "NOTION_TOKEN",
-        "NOTION_DATABASE_ID",
-        "OPENAI_API_KEY",
-    ]
 
-    missing_vars = [var for var in required_vars if not os.environ.get(var)]
-    if missing_vars:
-        print(f"Error: Missing required environment variables: {missing_vars}")
-        return 1
+def _post_stage(item: WorkItem) -> None:
+    """Step 4: Post to note.com as draft (with header image)."""
+    print(f"\n[Step 4] Posting article {item.label} to note.com as draft...")
+    _poster_session.post_draft(
+        item.title,
+        item.body,
+        header_image=item.header_image,
+        header_image_mime_type=item.header_image_mime_type,
+        header_image_extension=item.header_image_extension,
+    )
+    print("Successfully posted draft to note.com!")
 
-    database_id = os.environ["NOTION_DATABASE_ID"]
 
-    # Step 1: Fetch ready articles from Notion
-    print("\n[Step 1] Fetching ready articles from Notion...")
-    articles = fetch_ready_articles(database_id)
+async def _streamed_body(streamed: StreamedArticle, item: WorkItem) -> str:
+    """Wait for a streamed article to complete and return its body."""
+    try:
+        _, body = await streamed.result()
+    except asyncio.CancelledError:
+        streamed.cancel()
+        raise
+    print(f"Body for {item.label} complete: {len(body)} characters")
+    return body
 
-    if not articles:
-        print("No articles with Status='Ready' found. Exiting.")
-        return 0
 
-    print(f"Found {len(articles)} article(s) to process.")
+async def _process_articles(database_id: str) -> tuple[int, int] | None:
+    """
+    Fetch Ready articles and run them through the pipeline.
+
+    Returns:
+        Tuple of (success_count, error_count), or None if nothing was Ready.
+    """
+    format_workers = env_int("PIPELINE_FORMAT_WORKERS", PIPELINE_FORMAT_WORKERS)
+    render_workers = env_int("PIPELINE_RENDER_WORKERS", PIPELINE_RENDER_WORKERS)
+    done_workers = env_int("PIPELINE_DONE_WORKERS", PIPELINE_DONE_WORKERS)
+    queue_size = env_int("PIPELINE_QUEUE_SIZE", PIPELINE_QUEUE_SIZE)
+    tokens_per_minute = env_int("OPENAI_TOKENS_PER_MINUTE", OPENAI_TOKENS_PER_MINUTE, minimum=0)
+
+    async with AsyncNotionClient() as notion, AsyncArticleFormatter(
+        max_concurrency=format_workers, tokens_per_minute=tokens_per_minute
+    ) as formatter:
+        # Outcomes of earlier runs: unchanged pages that keep failing are
+        # skipped, and the incremental mode only queries recent edits
+        state = get_page_state_store()
+        run_started = datetime.now(timezone.utc)
+        edited_after = None
+        if state and env_flag("NOTION_INCREMENTAL"):
+            edited_after = state.get_checkpoint(database_id)
+            if edited_after:
+                print(f"Incremental mode: only pages edited since {edited_after}")
 
-    # Process each article
-    success_count = 0
-    error_count = 0
+        fetch_complete = False
+        # Last-edit times of failed pages that may be retried: the next
+        # checkpoint must not move past them
+        retry_pending: list[datetime] = []
 
-    for i, article in enumerate(articles, 1):
-        print(f"\n{'=' * 50}")
-        print(f"Processing article {i}/{len(articles)}")
-        print(f"ID: {article['title']}")
-        print(f"Mode: {article['mode']}")
-        print("=" * 50)
+        async def eligible_articles():
+            nonlocal fetch_complete
+            async for article in notion.iter_ready_articles(
+                database_id, edited_after=edited_after
+            ):
+                if state and not state.should_process(article.id, article.last_edited_time):
+                    print(
+                        f"Skipping article (ID: {article.title}): unchanged since "
+                        f"{state.max_attempts} failed attempt(s)"
+                    )
+                    continue
+                yield article
+            fetch_complete = True
 
-        # Create temp directory for header image
-        temp_dir = tempfile.mkdtemp(prefix="note_header_")
+        def record_outcome(item: WorkItem) -> None:
+            """Remember how this version of the page fared."""
+            if state is None:
+                return
+            article = item.article
+            outcome = OUTCOME_FAILED if item.error else OUTCOME_DONE
+            recorded = state.record(article.id, article.last_edited_time, outcome)
+            # An unrecorded failure holds the checkpoint back, like a retryable one
+            if item.error and (
+                not recorded or state.retries_left(article.id, article.last_edited_time)
+            ):
+                retry_pending.append(parse_notion_time(article.last_edited_time))
 
+        def save_checkpoint() -> None:
+            if state and fetch_complete:
+                try:
+                    state.set_checkpoint(database_id, min([run_started, *retry_pending]))
+                except Exception as e:
+                    print(f"Warning: Could not save the query checkpoint: {e}")
+
+        # Step 1: Fetch ready articles from Notion. Results are streamed into
+        # the pipeline page by page, so formatting starts on the first page
+        print("\n[Step 1] Fetching ready articles from Notion...")
+        ready = eligible_articles()
         try:
-            # Step 2: Format article with OpenAI (mode-specific)
-            print("\n[Step 2] Formatting article with OpenAI...")
-            content = article["content"]
+            first_article = await anext(ready)
+        except StopAsyncIteration:
+            save_checkpoint()
+            print("No articles with Status='Ready' found. Exiting.")
+            return None
+
+        async def stream_articles():
+            yield first_article
+            async for article in ready:
+                yield article
+
+        articles = stream_articles()
+        print(
+            f"Pipeline: {format_workers} format worker(s), "
+            f"{render_workers} render worker(s), queue size {queue_size}"
+        )
+
+        streaming = env_flag("OPENAI_STREAMING")
+
+        # Batch mode: format everything up front through one Batch API job
+        batch_results: dict = {}
+        if env_flag("OPENAI_BATCH_MODE"):
+            # One job covers every article, so the whole Ready queue is needed
+            articles = [article async for article in articles]
+            print(f"Found {len(articles)} article(s) to process.")
+            print("\n[Step 2] Formatting articles with the OpenAI Batch API...")
+            try:
+                batch_results = await format_articles_batch(
+                    [(a.id, a.content, a.mode) for a in articles if a.content.strip()],
+                    poll_interval=env_int("OPENAI_BATCH_POLL_INTERVAL", OPENAI_BATCH_POLL_INTERVAL),
+                    timeout=env_int("OPENAI_BATCH_TIMEOUT", OPENAI_BATCH_TIMEOUT),
+                    cancel_timeout=env_int(
+                        "OPENAI_BATCH_CANCEL_TIMEOUT", OPENAI_BATCH_CANCEL_TIMEOUT
+                    ),
+                )
+            except Exception as e:
+                print(f"Warning: Batch formatting failed ({e}), formatting articles directly")
+
+        async def format_stage(item: WorkItem) -> None:
+            """Step 2: Format article with OpenAI (mode-specific)."""
+            article = item.article
+            print(f"\n[Step 2] Formatting article {item.label} (Mode: {article.mode})...")
+            content = article.content
 
             if not content.strip():
-                print("Warning: Empty content (文章のネタ), skipping.")
-                error_count += 1
-                continue
+                raise ValueError("Empty content (文章のネタ), skipping.")
 
             print(f"Content preview: {content[:100]}...")
 
-            title, body = format_article(content, article["mode"])
-            print(f"Generated title: {title}")
-            print(f"Body length: {len(body)} characters")
+            batch_result = batch_results.pop(article.id, None)
+            if isinstance(batch_result, Exception):
+                print(f"Warning: {batch_result}; formatting {item.label} directly")
+                batch_result = None
+            if batch_result:
+                item.title, item.body = batch_result
+            elif streaming:
+                # Hand the article to rendering as soon as the title is known;
+                # the post stage waits for the rest of the body
+                streamed = formatter.stream(content, article.mode)
+                item.title = await streamed.title()
+                item.body_task = asyncio.ensure_future(_streamed_body(streamed, item))
+                print(f"Generated title for {item.label}: {item.title} (body still streaming)")
+                return
+            else:
+                item.title, item.body = await formatter.format(content, article.mode)
+            print(f"Generated title for {item.label}: {item.title}")
+            print(f"Body length: {len(item.body)} characters")
 
-            # Step 3: Generate header image with title
-            print("\n[Step 3] Generating header image...")
-            image_path = os.path.join(temp_dir, f"header_{article['id'][:8]}.png")
-            create_header_image(title, image_path)
-            print(f"Header image generated: {image_path}")
+        async def render_stage(item: WorkItem) -> None:
+            """Step 3: Generate header image with title (in a worker process)."""
+            print(f"\n[Step 3] Generating header image for {item.label}...")
+            # Rendered in memory and uploaded from the buffer: no temp files.
+            # Replays reuse the cached image without waking a render process.
+            item.header_image = await asyncio.to_thread(
+                get_cached_header, item.title, header_encoding
+            )
+            if item.header_image is not None:
+                print(f"Header image for {item.label} served from the cache")
+            else:
+                item.header_image = await asyncio.get_running_loop().run_in_executor(
+                    render_pool, render_header_bytes, item.title, header_encoding
+                )
+            item.header_image_mime_type = header_encoding.mime_type
+            item.header_image_extension = header_encoding.extension
+            print(
+                f"Header image generated: {len(item.header_image)} bytes "
+                f"({header_encoding.format})"
+            )
 
-            # Step 4: Post to note.com as draft (with header image)
-            print("\n[Step 4] Posting to note.com as draft...")
-            post_draft_to_note(title, body, header_image_path=image_path)
-            print("Successfully posted draft to note.com!")
-
-            # Step 5: Mark as Done in Notion
-            print("\n[Step 5] Updating Notion status to 'Done'...")
-            mark_as_done(article["id"])
+        async def done_stage(item: WorkItem) -> None:
+            """Step 5: Mark as Done in Notion (shares the pooled client)."""
+            print(f"\n[Step 5] Updating Notion status to 'Done' for {item.label}...")
+            await notion.mark_as_done(item.article.id)
             print("Notion status updated.")
 
-            success_count += 1
-
-        except Exception as e:
-            print(f"\nError processing article: {e}")
-            error_count += 1
-            # Continue with next article instead of failing completely
-            continue
+        # Header rendering is CPU-bound: run it in worker processes with warm
+        # font/background caches instead of threads contending for the GIL
+        render_pool = create_render_pool(render_workers)
+        header_encoding = get_header_encoding()
 
+        # Steps 2-5 run as a staged pipeline so that formatting and image
+        # rendering for upcoming articles overlap with posting the current one
+        try:
+            result = await run_pipeline(
+                articles,
+                format_stage=format_stage,
+                render_stage=render_stage,
+                post_stage=_post_stage,
+                done_stage=done_stage,
+                cleanup=record_outcome,
+                post_stage_teardown=_poster_session.close,
+                format_workers=format_workers,
+                render_workers=render_workers,
+                done_workers=done_workers,
+                queue_size=queue_size,
+            )
         finally:
-            # Clean up temp directory
-            if os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir, ignore_errors=True)
-                print("Temp files cleaned up")
+            render_pool.shutdown(wait=True)
+
+        save_checkpoint()
+        return result
+
+
+def main() -> int:
+    """Main entry point."""
+    print("=" * 50)
+    print("Notion-to-Note Article AutoDrafter")
+    print("=" * 50)
+
+    # Validate environment variables
+    required_vars = [
+        "NOTION_TOKEN",
+        "NOTION_DATABASE_ID",
+        "OPENAI_API_KEY",
+    ]
+
+    missing_vars = [var for var in required_vars if not os.environ.get(var)]
+    if missing_vars:
+        print(f"Error: Missing required environment variables: {missing_vars}")
+        return 1
+
+    database_id = os.environ["NOTION_DATABASE_ID"]
+
+    result = asyncio.run(_process_articles(database_id))
+    if result is None:
+        return 0
+    success_count, error_count = result
 
     # Summary
     print("\n" + "=" * 50)
@@ -3,9 +3,9 @@ Prompt definitions for different article modes.
 """
 
 from .base import NOTE_MARKDOWN_RULES
-from .empathy_essay import EMPATHY_ESSAY_PROMPT
-from .knowhow_business import KNOWHOW_BUSINESS_PROMPT
-from .rewrite import REWRITE_PROMPT
+from .empathy_essay import EMPATHY_ESSAY_PROMPT, EMPATHY_ESSAY_INPUT_LABEL
+from .knowhow_business import KNOWHOW_BUSINESS_PROMPT, KNOWHOW_BUSINESS_INPUT_LABEL
+from .rewrite import REWRITE_PROMPT, REWRITE_INPUT_LABEL
 
 # Mode name to prompt mapping
 MODE_PROMPTS = {
@@ -14,10 +14,21 @@ MODE_PROMPTS = {
     "推敲・リライト型": REWRITE_PROMPT,
 }
 
+# Mode name to the heading used for the raw content in the user message
+MODE_INPUT_LABELS = {
+    "共感・エッセイ型": EMPATHY_ESSAY_INPUT_LABEL,
+    "ノウハウ・ビジネス型": KNOWHOW_BUSINESS_INPUT_LABEL,
+    "推敲・リライト型": REWRITE_INPUT_LABEL,
+}
+
 __all__ = [
     "NOTE_MARKDOWN_RULES",
     "EMPATHY_ESSAY_PROMPT",
+    "EMPATHY_ESSAY_INPUT_LABEL",
     "KNOWHOW_BUSINESS_PROMPT",
+    "KNOWHOW_BUSINESS_INPUT_LABEL",
     "REWRITE_PROMPT",
+    "REWRITE_INPUT_LABEL",
     "MODE_PROMPTS",
+    "MODE_INPUT_LABELS",
 ]
@@ -6,7 +6,7 @@ KNOWHOW_BUSINESS_PROMPT = """# Role: noteビジネス・ライフハック専門
 あなたは「スキ」の保存率が異常に高い、情報の整理とデリバリーの達人です。読者の時間を奪わない「結論ファースト」と、スマホでの「スキャン読み（流し読み）」に最適化した構成を得意としています。
 
 # Input Data
-【解説したいノウハウ】: {content}
+【解説したいノウハウ】: ユーザーメッセージの末尾に記載します。
 
 # Constraints: 執筆の鉄則
 1. **逆三角形モデルの徹底**:
@@ -31,3 +31,6 @@ KNOWHOW_BUSINESS_PROMPT = """# Role: noteビジネス・ライフハック専門
 # Output
 （上記ルールを適用し、非常に有益で読みやすいプロ仕様の解説記事を出力してください）
 """
+
+# Heading for the raw content, which is sent last in the user message
+KNOWHOW_BUSINESS_INPUT_LABEL = "【解説したいノウハウ】"
@@ -6,8 +6,7 @@ REWRITE_PROMPT = """# Role: カリスマnote編集者
 あなたは、平凡な文章を「最後まで読ませる中毒性のある文章」に変える天才エディターです。以下の下書きを、noteの人気クリエイターの文体にリライトしてください。
 
 # Input Data
-【リライトしたい下書き】:
-{content}
+【リライトしたい下書き】: ユーザーメッセージの末尾に記載します。
 
 # Constraints: 改善のポイント
 1. **一文一意とリズム感**:
@@ -29,3 +28,6 @@ REWRITE_PROMPT = """# Role: カリスマnote編集者
 # Output
 （下書きのポテンシャルを最大限に引き出した、プロのnote記事を出力してください）
 """
+
+# Heading for the raw content, which is sent last in the user message
+REWRITE_INPUT_LABEL = "【リライトしたい下書き】"
@@ -0,0 +1,147 @@
+"""
+Tests for the OpenAI Batch API mode, against an in-process fake client.
+"""
+
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+# Add src directory to path for the application imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+from core import batch_formatter
+from core.batch_formatter import build_batch_jsonl, format_articles_batch, parse_batch_output
+
+
+def _output_line(custom_id: str, content: str) -> str:
+    return json.dumps({
+        "custom_id": custom_id,
+        "response": {
+            "status_code": 200,
+            "body": {"choices": [{"message": {"content": content}}]},
+        },
+    }, ensure_ascii=False)
+
+
+def _error_line(custom_id: str, message: str) -> str:
+    return json.dumps({
+        "custom_id": custom_id,
+        "response": {"status_code": 400, "body": {"error": {"message": message}}},
+    })
+
+
+class FakeBatchClient:
+    """
+    Stand-in for AsyncOpenAI: the batch never finishes on its own, and after
+    cancel() it stays 'cancelling' for `cancelling_polls` polls before the
+    output file of the requests it already finished becomes available.
+    """
+
+    def __init__(self, output_jsonl: str, cancelling_polls: int = 2):
+        self.output_jsonl = output_jsonl
+        self.cancelling_polls = cancelling_polls
+        self.uploaded: bytes | None = None
+        self.cancelled = False
+        self.closed = False
+        self.files = SimpleNamespace(create=self._create_file, content=self._file_content)
+        self.batches = SimpleNamespace(
+            create=self._create_batch, retrieve=self._retrieve, cancel=self._cancel
+        )
+
+    def _batch(self, status: str, output_file_id: str | None = None):
+        return SimpleNamespace(
+            id="batch_1",
+            status=status,
+            output_file_id=output_file_id,
+            error_file_id=None,
+            request_counts=None,
+        )
+
+    async def _create_file(self, file, purpose):
+        self.uploaded = file[1]
+        return SimpleNamespace(id="file_in")
+
+    async def _file_content(self, file_id):
+        assert file_id == "file_out"
+        return SimpleNamespace(text=self.output_jsonl)
+
+    async def _create_batch(self, **kwargs):
+        return self._batch("in_progress")
+
+    async def _retrieve(self, batch_id):
+        if not self.cancelled:
+            return self._batch("in_progress")
+        if self.cancelling_polls > 0:
+            self.cancelling_polls -= 1
+            return self._batch("cancelling")
+        return self._batch("cancelled", output_file_id="file_out")
+
+    async def _cancel(self, batch_id):
+        self.cancelled = True
+        return self._batch("cancelling")
+
+    async def close(self):
+        self.closed = True
+
+
+def test_build_batch_jsonl_one_request_per_article():
+    data = build_batch_jsonl([("a", "本文A", "共感・エッセイ型"), ("b", "本文B", "推敲・リライト型")], "m")
+    lines = data.decode("utf-8").splitlines()
+
+    assert len(lines) == 2
+    first = json.loads(lines[0])
+    assert first["custom_id"] == "a"
+    assert first["url"] == batch_formatter.BATCH_ENDPOINT
+    assert first["body"]["model"] == "m"
+    assert "本文A" in first["body"]["messages"][-1]["content"]
+
+
+def test_parse_batch_output_results_and_errors():
+    output = "\n".join([
+        _output_line("a", "タイトル\n\n本文"),
+        _error_line("b", "bad request"),
+        "",
+    ])
+
+    results = parse_batch_output(output)
+
+    assert results["a"] == ("タイトル", "本文")
+    assert isinstance(results["b"], RuntimeError)
+    assert "bad request" in str(results["b"])
+
+
+def test_timeout_waits_for_cancelled_batch_partial_results(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("FORMAT_CACHE_DISABLE", "1")
+    client = FakeBatchClient(_output_line("a", "タイトル\n\n本文"), cancelling_polls=2)
+    monkeypatch.setattr(batch_formatter, "AsyncOpenAI", lambda **kwargs: client)
+
+    results = asyncio.run(format_articles_batch(
+        [("a", "本文A", "共感・エッセイ型"), ("b", "本文B", "共感・エッセイ型")],
+        poll_interval=0,
+        timeout=0,
+        cancel_timeout=5,
+    ))
+
+    assert client.cancelled
+    assert client.closed
+    # The finished request is kept; the unfinished one is left for direct formatting
+    assert results == {"a": ("タイトル", "本文")}
+
+
+def test_cancel_timeout_gives_up_without_output(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("FORMAT_CACHE_DISABLE", "1")
+    client = FakeBatchClient(_output_line("a", "タイトル\n\n本文"), cancelling_polls=10**9)
+    monkeypatch.setattr(batch_formatter, "AsyncOpenAI", lambda **kwargs: client)
+
+    results = asyncio.run(format_articles_batch(
+        [("a", "本文A", "共感・エッセイ型")],
+        poll_interval=0,
+        timeout=0,
+        cancel_timeout=0.05,
+    ))
+
+    assert client.cancelled
+    assert results == {}
@@ -0,0 +1,55 @@
+"""
+Tests for header title line breaking.
+"""
+
+import os
+import sys
+
+# Add src directory to path for the application imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+from core.image_generator import (
+    TITLE_MAX_WIDTH,
+    _break_lines_optimal,
+    _get_font_for_title,
+    _splits_kanji_compound,
+    _wrap_text,
+)
+
+LONG_TITLE = (
+    "毎日の生活習慣を見直して健康的な人生を手に入れるための具体的な方法と、"
+    "忙しい社会人でも今日から無理なく続けられる小さな工夫についての話をまとめました"
+)
+
+
+def test_long_title_uses_fewest_lines():
+    font = _get_font_for_title(LONG_TITLE, 50)
+
+    lines, _ = _break_lines_optimal(LONG_TITLE, font, TITLE_MAX_WIDTH, allow_prohibited=True)
+
+    assert "".join(lines) == LONG_TITLE
+    # Good break points must not pay for extra lines
+    assert len(lines) <= len(_wrap_text(LONG_TITLE, font, TITLE_MAX_WIDTH))
+
+
+def test_short_title_stays_on_one_line():
+    title = "朝の習慣を変える"
+    font = _get_font_for_title(title, 120)
+
+    lines, _ = _break_lines_optimal(title, font, TITLE_MAX_WIDTH, max_lines=2)
+
+    assert lines == [title]
+
+
+def test_badness_is_never_negative():
+    font = _get_font_for_title(LONG_TITLE, 50)
+
+    _, badness = _break_lines_optimal(LONG_TITLE, font, TITLE_MAX_WIDTH, allow_prohibited=True)
+
+    assert badness >= 0
+
+
+def test_splits_kanji_compound():
+    assert _splits_kanji_compound(["健康的な人生を手に入れる方", "法"])
+    assert not _splits_kanji_compound(["健康的な人生を", "手に入れる方法"])
+    assert not _splits_kanji_compound(["プログラミングとマネジメント", "ベストプラクティス"])
+    assert not _splits_kanji_compound(["一行だけ"])